@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Memory footprint of the firms of ComplexEconomy, in bytes per firm.
+
+For each firm count the benchmark economy is built under tracemalloc and the
+following are reported per group:
+
+* ``object_bytes``: the firm object itself, with its ``__dict__`` if it has
+  one, and the objects only it refers to (machine, demand history, machine
+  stock and its arrays),
+* ``traced_bytes_per_firm``: everything allocated while building the model,
+  divided by the number of firms.
+
+With ``--steps`` the firm objects are measured after stepping the model, when
+all of their attributes have been set.
+
+Results are written as JSON::
+
+    python benchmarks/memory.py --sizes 1000/250 100000/25000 --out memory.json
+"""
+import argparse
+from copy import deepcopy
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from complex_economies.parameters import benchmark_parameters, initial_conditions  # noqa: E402
+from scaling import environment, parse_size  # noqa: E402
+
+
+sizes = [(1000, 250), (10000, 2500), (100000, 25000)]
+
+# attributes holding objects that belong to a single firm
+owned = ['machine', 'machines', 'demand_history', 'want_to_scrap']
+
+
+def object_bytes(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(vars(obj))
+    return size
+
+
+def firm_bytes(firm):
+    size = object_bytes(firm)
+    for name in owned:
+        value = getattr(firm, name, None)
+        # class level defaults are shared, not owned
+        if value is None or value is getattr(type(firm), name, None):
+            continue
+        size += object_bytes(value)
+        for array in ('vintages', 'stock'):
+            if hasattr(value, array):
+                size += getattr(value, array).nbytes
+    return size
+
+
+def run_config(n_consumption, n_capital, seed=0, steps=0):
+    from complex_economies.model import ComplexEconomy
+
+    parameters = deepcopy(benchmark_parameters)
+    parameters['n_consumption_firms'] = n_consumption
+    parameters['n_capital_firms'] = n_capital
+    conditions = deepcopy(initial_conditions)
+    conditions['labour_supply'] *= (
+        n_consumption / benchmark_parameters['n_consumption_firms']
+    )
+
+    tracemalloc.start()
+    model = ComplexEconomy(parameters, seed=seed, **conditions)
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for _ in range(steps):
+        model.step()
+
+    result = {
+        'n_consumption_firms': n_consumption,
+        'n_capital_firms': n_capital,
+        'steps': steps,
+        'traced_bytes_per_firm': traced / (n_consumption + n_capital)
+    }
+    for group in model.groups:
+        firms = model.get_group(group)
+        result[group] = {
+            'object_bytes': sum(map(firm_bytes, firms)) / len(firms),
+            'has_dict': hasattr(firms[0], '__dict__')
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=parse_size,
+                        help='firm counts as consumption/capital, e.g. 200/50')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--steps', type=int, default=0,
+                        help='steps to run before measuring the firms')
+    parser.add_argument('--out', default='memory.json')
+    args = parser.parse_args(argv)
+
+    output = {'environment': environment(), 'results': []}
+    for n_consumption, n_capital in args.sizes or sizes:
+        result = run_config(
+            n_consumption, n_capital, args.seed, args.steps
+        )
+        print(
+            f'{n_consumption}/{n_capital}: '
+            f'{result["traced_bytes_per_firm"]:.0f} B/firm traced, '
+            + ', '.join(
+                f'{group} {result[group]["object_bytes"]:.0f} B'
+                for group in ('consumption_firm', 'capital_firm')
+            ),
+            file=sys.stderr
+        )
+        output['results'].append(result)
+        with open(args.out, 'w') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""Scaling benchmark for ComplexEconomy across firm counts and horizons.
+
+Each firm count runs in its own subprocess, so peak RSS is measured per
+configuration. A run goes up to the longest horizon and is measured at every
+horizon on the way, i.e. the 1000 step result is the first 1000 steps of the
+5000 step run. The horizons measured before a configuration fails, times out
+or is killed are kept, followed by an entry with its ``error``.
+``collection_time`` is the time spent in ``datacollector.collect`` and
+``record_tables``. ``--profile`` turns on the step profiler and adds the time
+of every part of a step, at the cost of some overhead. Results are written
+as JSON::
+
+    python benchmarks/scaling.py --quick --out results.json
+    python benchmarks/scaling.py --sizes 200/50 2000/500 --steps 100 1000
+    python benchmarks/scaling.py --quick --numeric float decimal
+    python benchmarks/scaling.py --quick --profile
+    python benchmarks/scaling.py --compare before.json after.json
+"""
+import argparse
+from copy import deepcopy
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from complex_economies.parameters import benchmark_parameters, initial_conditions  # noqa: E402
+
+
+# every consumption firm starts with one vintage per capital firm, so memory
+# and step time grow with the product of the two counts: 5000/1250 peaks at
+# about 0.5 GB and 1.3 s/step, 20000/5000 at roughly 16 times that, and
+# 100000/25000 does not fit in memory
+sizes = [(200, 50), (1000, 250), (5000, 1250), (20000, 5000)]
+horizons = [100, 500, 1000, 5000]
+quick_sizes = [(200, 50), (1000, 250)]
+quick_horizons = [100, 500]
+
+# seconds before a configuration is abandoned
+default_timeout = 3600
+
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return peak * scale / 2 ** 20
+
+
+def time_calls(owner, name, timer):
+    """Add the time spent in ``owner.name`` to ``timer['time']``."""
+    method = getattr(owner, name)
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timer['time'] += time.perf_counter() - start
+
+    setattr(owner, name, timed)
+
+
+def run_config(n_consumption, n_capital, steps, numeric='float', seed=0,
+               profile=False):
+    """Run one firm count up to ``max(steps)``, yielding the result of each
+    horizon as soon as it is reached."""
+    from complex_economies.model import ComplexEconomy
+
+    parameters = deepcopy(benchmark_parameters)
+    parameters['n_consumption_firms'] = n_consumption
+    parameters['n_capital_firms'] = n_capital
+    conditions = deepcopy(initial_conditions)
+    # keep the labour supply per firm of the benchmark economy
+    conditions['labour_supply'] *= (
+        n_consumption / benchmark_parameters['n_consumption_firms']
+    )
+
+    start = time.perf_counter()
+    model = ComplexEconomy(
+        parameters, seed=seed, numeric=numeric, profile=profile,
+        **conditions
+    )
+    construction_time = time.perf_counter() - start
+    construction_rss = peak_rss_mb()
+    # the scheduler looks up record_tables on the model by name
+    collection = {'time': 0}
+    time_calls(model.datacollector, 'collect', collection)
+    time_calls(model, 'record_tables', collection)
+
+    run_time = 0
+    for horizon in sorted(steps):
+        start = time.perf_counter()
+        while model.schedule.steps < horizon:
+            model.step()
+        run_time += time.perf_counter() - start
+        result = {
+            'n_consumption_firms': n_consumption,
+            'n_capital_firms': n_capital,
+            'steps': horizon,
+            'numeric': numeric,
+            'seed': seed,
+            'construction_time': construction_time,
+            'construction_rss_mb': construction_rss,
+            'run_time': run_time,
+            'steps_per_sec': horizon / run_time,
+            'collection_time': collection['time'],
+            'peak_rss_mb': peak_rss_mb()
+        }
+        if profile:
+            report = model.profiler.report()
+            result['profile'] = {
+                f'{stage}/{name}': float(row['time'])
+                for (stage, name, _), row in report.iterrows()
+            }
+        yield result
+
+
+def decode(output):
+    # the output of a timed out process may be bytes despite text=True
+    if isinstance(output, bytes):
+        return output.decode(errors='replace')
+    return output or ''
+
+
+def run_subprocess(n_consumption, n_capital, steps, numeric, seed,
+                   timeout=default_timeout, profile=False):
+    """Run one configuration in a child process.
+
+    Returns the results of the horizons the child reported, followed by an
+    entry with an ``error`` if it did not finish.
+    """
+    config = {
+        'n_consumption': n_consumption, 'n_capital': n_capital,
+        'steps': steps, 'numeric': numeric, 'seed': seed,
+        'profile': profile
+    }
+    command = [sys.executable, __file__, '--child', json.dumps(config)]
+    try:
+        process = subprocess.run(
+            command, capture_output=True, text=True, timeout=timeout
+        )
+        stdout, stderr = process.stdout, process.stderr
+        returncode = process.returncode
+    except subprocess.TimeoutExpired as expired:
+        stdout, stderr = decode(expired.stdout), decode(expired.stderr)
+        returncode = None
+    # one line per finished horizon, the last may be cut off by a kill
+    results = []
+    for line in stdout.splitlines():
+        try:
+            results.append(json.loads(line))
+        except json.JSONDecodeError:
+            break
+    if returncode == 0:
+        return results
+    if returncode is None:
+        error = f'timed out after {timeout}s'
+    elif returncode < 0:
+        error = f'killed by signal {-returncode}'
+    else:
+        error = f'exited with code {returncode}'
+    lines = stderr.strip().splitlines()
+    if lines:
+        error = f'{error}: {lines[-1]}'
+    return results + [dict(config, error=error)]
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    import mesa
+    import numpy
+    import pandas
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'mesa': mesa.__version__,
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__
+    }
+
+
+def compare(before, after):
+    """Print the speedup of each configuration found in both result files."""
+    def key(result):
+        return (result['n_consumption_firms'], result['n_capital_firms'],
+                result['steps'], result.get('numeric', 'float'))
+
+    old = {key(r): r for r in before['results'] if 'error' not in r}
+    print(f'{"firms":>14} {"steps":>6} {"numeric":>8} '
+          f'{"steps/s":>9} {"before":>9} {"speedup":>8} {"rss":>8}')
+    for result in after['results']:
+        if 'error' in result or key(result) not in old:
+            continue
+        previous = old[key(result)]
+        firms = f'{result["n_consumption_firms"]}/{result["n_capital_firms"]}'
+        print(
+            f'{firms:>14} {result["steps"]:>6} '
+            f'{result.get("numeric", "float"):>8} '
+            f'{result["steps_per_sec"]:>9.2f} '
+            f'{previous["steps_per_sec"]:>9.2f} '
+            f'{result["steps_per_sec"] / previous["steps_per_sec"]:>7.2f}x '
+            f'{result["peak_rss_mb"] / previous["peak_rss_mb"]:>7.2f}x'
+        )
+
+
+def parse_size(value):
+    n_consumption, n_capital = value.split('/')
+    return int(n_consumption), int(n_capital)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=parse_size,
+                        help='firm counts as consumption/capital, e.g. 200/50')
+    parser.add_argument('--steps', nargs='+', type=int, help='horizons')
+    parser.add_argument('--quick', action='store_true',
+                        help=f'only sizes {quick_sizes} and horizons '
+                             f'{quick_horizons}')
+    parser.add_argument('--numeric', nargs='+', default=['float'],
+                        help='numeric backends')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=default_timeout,
+                        help='seconds before a configuration is abandoned, '
+                             'defaults to %(default)s')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile the steps and report the time of '
+                             'each part, slows the run down')
+    parser.add_argument('--out', default='scaling.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        config = json.loads(args.child)
+        for result in run_config(**config):
+            print(json.dumps(result), flush=True)
+        return None
+    if args.compare:
+        with open(args.compare[0]) as before, open(args.compare[1]) as after:
+            compare(json.load(before), json.load(after))
+        return None
+
+    run_sizes = args.sizes or (quick_sizes if args.quick else sizes)
+    run_steps = args.steps or (quick_horizons if args.quick else horizons)
+    output = {'environment': environment(), 'results': []}
+    for numeric in args.numeric:
+        for n_consumption, n_capital in run_sizes:
+            results = run_subprocess(
+                n_consumption, n_capital, run_steps, numeric, args.seed,
+                args.timeout, args.profile
+            )
+            for result in results:
+                if 'error' in result:
+                    print(f'{n_consumption}/{n_capital} {numeric}: '
+                          f'{result["error"]}', file=sys.stderr)
+                else:
+                    print(f'{n_consumption}/{n_capital} {numeric} '
+                          f'{result["steps"]} steps: '
+                          f'{result["steps_per_sec"]:.2f} steps/s, '
+                          f'{result["collection_time"]:.2f} s collecting, '
+                          f'{result["peak_rss_mb"]:.0f} MB', file=sys.stderr)
+            output['results'].extend(results)
+            # keep what has finished if a later configuration is interrupted
+            with open(args.out, 'w') as f:
+                json.dump(output, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
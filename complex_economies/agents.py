@@ -1,16 +1,19 @@
 
-from copy import deepcopy
+from collections import deque
 import logging
-from pprint import pformat
+from operator import attrgetter
 
-from mesa import Agent
 # from numpy.random import uniform
 
-from complex_economies.utils import messages
-from complex_economies.utils.misc import d
+from complex_economies.vintages import MachineStock
 
 
 class Machine:
+
+    __slots__ = (
+        'producer', 'generation', 'labour_productivity_coefficient', 'price'
+    )
+
     def __init__(self, producer, generation, lpc, price):
         self.producer = producer
         self.generation = generation
@@ -25,27 +28,57 @@ class Machine:
         return model.market_wage / self.labour_productivity_coefficient
 
 
-class Firm(Agent):
+class Firm:
+    """Base class of the firms, with the interface of mesa's ``Agent``.
 
-    log = logging.getLogger(__name__)
+    Firm state is kept in ``__slots__`` rather than a ``__dict__`` per firm,
+    which is why firms do not derive from ``Agent``: a subclass of a class
+    without slots always gets a ``__dict__``. Every slot is set in
+    ``__init__``, so no state is shared through class attributes.
+    """
+
+    __slots__ = (
+        'unique_id', 'model', 'pos', 'bankrupt', 'liquid_assets',
+        'market_share', 'debt_stock', 'unit_production_cost',
+        'competitiveness', 'capital_employed', 'debt_employed',
+        'residual_assets', 'available_debt', 'demand', 'output', 'sales',
+        'labour_demand', 'profit'
+    )
 
-    debt_stock = d(0)
-    unit_production_cost = d(0)
-    competitiveness = d(100)
-    capital_employed = d(0)
-    debt_employed = d(0)
-    residual_assets = None
-    available_debt = None
+    log = logging.getLogger(__name__)
 
-    bankrupt = False
+    group = None
 
     def __init__(self, unique_id, model, liquid_assets, market_share):
-        super().__init__(unique_id, model)
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
+        self.bankrupt = False
+
+        self.liquid_assets = model.number(liquid_assets)
+        self.market_share = model.number(market_share)
+
+        self.debt_stock = 0
+        self.unit_production_cost = 0
+        self.competitiveness = 100
+        self.capital_employed = 0
+        self.debt_employed = 0
+        self.residual_assets = None
+        self.available_debt = None
+        self.labour_demand = 0
+        self.profit = 0
 
-        self.group = None
+    @property
+    def random(self):
+        return self.model.random
 
-        self.liquid_assets = d(liquid_assets)
-        self.market_share = d(market_share)
+    def table_row(self):
+        row = {'step': self.model.schedule.steps}
+        row.update({
+            name: attrgetter(attribute)(self)
+            for name, (attribute, _) in self.table_columns.items()
+        })
+        return row
 
     def fix_price(self):
         return (1 + self.model.mark_up) * self.unit_production_cost
@@ -59,42 +92,81 @@ class Firm(Agent):
 
 class ConsumptionGoodFirm(Firm):
 
-    inventory = d(0)
-    unfilled_demand_rate = d(0)
-    average_productivity = d(0)
-    price = d(0)
-    expected_demand = d(0)
-    desired_production = d(0)
-    desired_capital_stock = d(0)
-    production_rationed = False
-    planned_production = d(0)
-    want_to_scrap = []
-    desired_ei = d(0)
-    desired_ri = d(0)
-    expansion_investment = d(0)
-    replacement_investment = d(0)
-    labour_demand = d(0)
-    profit = d(0)
+    __slots__ = (
+        'supplier', 'capital_stock', 'machines', 'demand_history',
+        'production', 'inventory', 'unfilled_demand_rate',
+        'average_productivity', 'price', 'expected_demand',
+        'desired_production', 'desired_capital_stock', 'production_rationed',
+        'planned_production', 'want_to_scrap', 'desired_ei', 'desired_ri',
+        'expansion_investment', 'replacement_investment'
+    )
+
+    group = 'consumption_firm'
+
+    # agent table columns: {column: (attribute, dtype)}
+    table_columns = {
+        'agent_id': ('unique_id', 'int64'),
+        'competitiveness': ('competitiveness', 'float64'),
+        'expected_demand': ('expected_demand', 'float64'),
+        'market_share': ('market_share', 'float64'),
+        'demand': ('demand', 'float64'),
+        'desired_production': ('desired_production', 'float64'),
+        'desired_capital_stock': ('desired_capital_stock', 'float64'),
+        'labour_demand': ('labour_demand', 'float64'),
+        'desired_ei': ('desired_ei', 'float64'),
+        'desired_ri': ('desired_ri', 'float64'),
+        'supplier': ('supplier', 'int64'),
+        'expansion_investment': ('expansion_investment', 'float64'),
+        'replacement_investment': ('replacement_investment', 'float64'),
+        'production': ('production', 'float64'),
+        'output': ('output', 'float64'),
+        'inventory': ('inventory', 'float64'),
+        'sales': ('sales', 'float64'),
+        'profit': ('profit', 'float64'),
+        'liquid_assets': ('liquid_assets', 'float64'),
+        'capital_stock': ('capital_stock', 'float64'),
+        'debt_stock': ('debt_stock', 'float64'),
+        'price': ('price', 'float64'),
+        'upc': ('unit_production_cost', 'float64'),
+        'average_productivity': ('average_productivity', 'float64'),
+        'available_debt': ('available_debt', 'float64'),
+        'bankrupt': ('bankrupt', 'bool')
+    }
 
     def __init__(self, unique_id, model, liquid_assets, capital_stock,
                  market_share, supplier=None):
         super().__init__(unique_id, model, liquid_assets, market_share)
 
-        self.group = 'consumption_firm'
         self.supplier = supplier
+        self.inventory = 0
+        self.unfilled_demand_rate = 0
+        self.average_productivity = 0
+        self.price = 0
+        self.expected_demand = 0
+        self.desired_production = 0
+        self.desired_capital_stock = 0
+        self.production_rationed = False
+        self.planned_production = 0
+        self.want_to_scrap = []
+        self.desired_ei = 0
+        self.desired_ri = 0
+        self.expansion_investment = 0
+        self.replacement_investment = 0
 
         # initial values
-        self.capital_stock = capital_stock
+        self.capital_stock = model.number(capital_stock)
 
         # calculated
         capital_firms = self.model.get_group('capital_firm')
-        self.machines = {
-            (supplier.unique_id, supplier.machine.generation): {
-                'machine': supplier.machine,
-                'stock': 40
-            } for supplier in capital_firms
-        }
+        registry = self.model.vintages
+        self.machines = MachineStock(
+            registry,
+            [registry.intern(supplier.machine) for supplier in capital_firms],
+            [40] * len(capital_firms)
+        )
         self.demand = self.market_share * self.model.consumption  # / self.model.cpi
+        # most recent demand first, as many values as there are betas
+        self.demand_history = deque([self.demand], maxlen=len(self.model.betas))
         self.production = self.demand
         self.output = self.production
         self.sales = self.output
@@ -113,9 +185,7 @@ class ConsumptionGoodFirm(Firm):
             'debt_stock': self.debt_stock,
             'supplier': self.supplier
         }
-        self.model.datacollector.add_table_row(
-            'consumption_firm', row, ignore_missing=True
-        )
+        self.model.recorder.add_table_row('consumption_firm', row)
 
     @property
     def investment(self):
@@ -126,7 +196,7 @@ class ConsumptionGoodFirm(Firm):
         return self.residual_assets + self.available_debt
 
     def compute_max_quantity(self, unit_cost):
-        return d(int(self.available_financing / unit_cost))
+        return int(self.available_financing / unit_cost)
 
     def compute_unfilled_demand(self):
         if self.demand == 0:
@@ -134,17 +204,8 @@ class ConsumptionGoodFirm(Firm):
         return 1 - self.sales / self.demand
 
     def compute_average_productivity(self):
-        productivities = []
-        machine_set = list(self.machines.keys())
-        for machine_type in machine_set:
-            machine = self.machines[machine_type]['machine']
-            stock = self.machines[machine_type]['stock']
-            productivity = (
-                machine.labour_productivity_coefficient * stock
-            )
-            productivities.append(productivity)
-        avgp = sum(productivities) / self.capital_stock
-        return d(float(avgp))
+        productivity = self.model.number(self.machines.productivity())
+        return productivity / self.capital_stock
 
     def compute_unit_production_cost(self):
         return (
@@ -163,15 +224,8 @@ class ConsumptionGoodFirm(Firm):
     def forecast_demand(self, myopic=True):
         if myopic:
             return self.demand
-        firm_data = self.model.datacollector.get_table_dataframe(
-            'consumption_firm'
-        )
-        # model_data = self.model.datacollector.get_model_vars_dataframe()
-        past_demand = firm_data.loc[
-            firm_data.agent_id == self.unique_id, 'demand'
-        ].tolist()[-4:]
         return sum([
-            b * d(t) for b, t in zip(self.model.betas, past_demand)
+            b * t for b, t in zip(self.model.betas, self.demand_history)
         ])
 
     def forecast_production(self):
@@ -179,9 +233,9 @@ class ConsumptionGoodFirm(Firm):
         return max(0, demand_net)
 
     def forecast_capital_stock(self):
-        return d(int(
+        return int(
             self.desired_production / self.model.desired_capital_utilization
-        ))
+        )
 
     def plan_production(self):
         production_max = self.compute_max_quantity(
@@ -204,48 +258,13 @@ class ConsumptionGoodFirm(Firm):
         return self.planned_production / self.average_productivity
 
     def forecast_expansion_investment(self):
-        trigger_level = d(int(self.capital_stock * (1 + self.model.trigger_rule)))
+        trigger_level = int(self.capital_stock * (1 + self.model.trigger_rule))
         planned_ei = 0
         if self.desired_capital_stock >= trigger_level:
             # NOTE: in paper this is trigger_level
             planned_ei = trigger_level - self.capital_stock
         return planned_ei
 
-    def choose_supplier(self, subset=10):
-        # NOTE: in the paper, supplier is chosen based on market share
-        current_supplier = self.model.schedule.get_agent(self.supplier, _raise=False)
-        capital_firms = self.model.get_group('capital_firm')
-        sample = self.random.sample(capital_firms, subset)
-        ratios = [s.machine.lpc_price_ratio for s in sample]
-        new_supplier_id = sample[ratios.index(max(ratios))].unique_id
-        if not current_supplier or current_supplier.bankrupt:
-            return new_supplier_id
-        return (
-            new_supplier_id
-            if max(ratios) > current_supplier.machine.lpc_price_ratio
-            else self.supplier  # NOTE: causes consolidation in cap market?
-        )
-
-    def plan_replacement(self):
-        supplier = self.model.schedule.get_agent(self.supplier)
-        machine_set = [k for k, v in self.machines.items() if v['stock'] > 0]
-        want_to_scrap = []
-        for machine_type in machine_set:
-            machine = self.machines[machine_type]['machine']
-            unit_labour_cost = machine.compute_unit_labour_cost(self.model)
-            if unit_labour_cost == supplier.unit_production_cost:
-                continue
-            x = (
-                supplier.price
-                / (unit_labour_cost - supplier.unit_production_cost)
-            )
-            if x <= self.model.payback_period_parameter:
-                want_to_scrap.append(machine_type)
-        return want_to_scrap
-
-    def forecast_replacement_investment(self):
-        return sum([self.machines[m]['stock'] for m in self.want_to_scrap])
-
     def fix_investment(self):
         """Allocate between expanding capital stock and replacement
         """
@@ -274,17 +293,13 @@ class ConsumptionGoodFirm(Firm):
 
     def compute_market_share(self):
         sector_avg_comp = self.model.avg_comp_competitiveness
-        if self.unique_id == 50:
-            self.log.info('computing market share')
-            self.log.info(f'own competitiveness: {self.competitiveness}')
-            self.log.info(f'sector average competitiveness: {sector_avg_comp}')
         ms = (
             self.market_share
             * (1 + self.model.replicator_dynamics_coeff[0]
                * (self.competitiveness - sector_avg_comp)
                / sector_avg_comp)
         )
-        return d(max(0, ms))
+        return max(0, ms)
 
     def compute_demand(self):  # TODO: should be dependant on price?
         return self.model.consumption * self.market_share  # / self.price
@@ -325,45 +340,29 @@ class ConsumptionGoodFirm(Firm):
     def compute_liquid_assets(self):
         return self.liquid_assets + self.profit - self.capital_employed
 
-    def reimburse_investment(self, received_orders):
-        self.liquid_assets += (
-            received_orders * self.model.schedule.get_agent(self.supplier).price
-        )
-        if received_orders < self.expansion_investment:
-            self.expansion_investment = received_orders
-            self.replacement_investment = 0
-        else:
-            self.replacement_investment = received_orders - self.expansion_investment
-
     def replace_and_add_machines(self):  # TODO: add logging
+        # rationed orders are settled by ComplexEconomy.settle_orders
         supplier = self.model.schedule.get_agent(self.supplier)
-        if supplier.output < supplier.demand:
-            # TODO: assign residual orders to firms
-            received_orders = (
-                int(d(self.investment / supplier.orders) * supplier.output)
-            )
-            self.reimburse_investment(received_orders)
         new_machines = self.expansion_investment
-        for machine_type in self.want_to_scrap:
-            stock = self.machines[machine_type]['stock']
+        scrapped, quantities = [], []
+        stocks = self.machines.get(self.want_to_scrap).tolist()
+        for vintage, stock in zip(self.want_to_scrap, stocks):
+            stock = self.model.number(stock)
+            scrapped.append(vintage)
             if stock <= self.replacement_investment:
-                self.machines.pop(machine_type)
+                quantities.append(None)
                 new_machines += stock
             else:
-                self.machines[machine_type]['stock'] -= self.replacement_investment
+                quantities.append(self.replacement_investment)
                 new_machines += self.replacement_investment
                 break
-        new_type = (supplier.unique_id, supplier.machine.generation)
-        if new_type in self.machines:
-            self.machines[new_type]['stock'] += new_machines
-            return None
-        self.machines[new_type] = {
-            'machine': deepcopy(supplier.machine),
-            'stock': new_machines
-        }
+        if scrapped:
+            self.machines.scrap(scrapped, quantities)
+        new_vintage = self.model.vintages.intern(supplier.machine)
+        self.machines.add(new_vintage, new_machines)
 
     def compute_capital_stock(self):
-        return sum([mtype['stock'] for mtype in self.machines.values()])
+        return self.model.number(self.machines.total())
 
     # stage methods
     def stage_one(self):
@@ -382,54 +381,18 @@ class ConsumptionGoodFirm(Firm):
             self.adjust_competitiveness()
         # self.debt_availability = self.compute_debt_availability()
 
-        if self.unique_id == 50:
-            self.log.info(messages.comp_stage_one.format(
-                step=self.model.schedule.steps,
-                stage=self.model.schedule.stage,
-                group=self.group,
-                agent_id=self.unique_id,
-                res_assets=self.residual_assets,
-                res_debt=self.available_debt,
-                unfilled_demand=self.unfilled_demand_rate,
-                avg_prod=self.average_productivity,
-                upc=self.unit_production_cost,
-                price=self.price,
-                compet=self.competitiveness
-            ))
-
     def stage_two(self):
         if self.bankrupt:
             return None
 
-        self.expected_demand = self.forecast_demand()
+        self.expected_demand = self.forecast_demand(self.model.myopic)
         self.desired_production = self.forecast_production()
         self.desired_capital_stock = self.forecast_capital_stock()
         self.planned_production = self.plan_production()
         self.labour_demand = self.compute_labour_demand()
-        self.supplier = self.choose_supplier()
-        self.want_to_scrap = self.plan_replacement()
         self.desired_ei = self.forecast_expansion_investment()
-        self.desired_ri = self.forecast_replacement_investment()
         self.expansion_investment, self.replacement_investment = self.fix_investment()
-        # register order with supplier
-        self.model.schedule.get_agent(self.supplier).orders += self.investment
-
-        if self.unique_id == 50:
-            self.log.info(messages.comp_stage_two.format(
-                step=self.model.schedule.steps,
-                stage=self.model.schedule.stage,
-                group=self.group,
-                agent_id=self.unique_id,
-                demand_e=self.expected_demand,
-                production_d=self.desired_production,
-                cap_stock_d=self.desired_capital_stock,
-                production_p=self.planned_production,
-                labour_demand=self.labour_demand,
-                supplier=self.supplier,
-                scrap=pformat(self.want_to_scrap),
-                expansion_i=self.expansion_investment,
-                replacement_i=self.replacement_investment
-            ))
+        # orders are placed with suppliers by ComplexEconomy.collect_orders
 
     def stage_three(self):
         if self.bankrupt:
@@ -443,6 +406,7 @@ class ConsumptionGoodFirm(Firm):
 
         self.market_share = self.compute_market_share()
         self.demand = self.compute_demand()
+        self.demand_history.appendleft(self.demand)
         self.production = self.fix_production()  # need to adjust labour demand here
         self.output = self.production + self.inventory
         self.sales = self.compute_sales()
@@ -450,55 +414,7 @@ class ConsumptionGoodFirm(Firm):
         self.profit = self.compute_profit()
         self.liquid_assets = self.compute_liquid_assets()
 
-        if self.unique_id == 50:
-            self.log.info(messages.comp_stage_four.format(
-                step=self.model.schedule.steps,
-                stage=self.model.schedule.stage,
-                group=self.group,
-                agent_id=self.unique_id,
-                market_share=self.market_share,
-                demand=self.demand,
-                production=self.production,
-                output=self.output,
-                sales=self.sales,
-                inventory=self.inventory,
-                profit=self.profit,
-                assets=self.liquid_assets
-            ))
-
     def stage_five(self):
-
-        row = {
-            'step': self.model.schedule.steps,
-            'agent_id': self.unique_id,
-            'competitiveness': self.competitiveness,
-            'expected_demand': self.expected_demand,
-            'market_share': self.market_share,
-            'demand': self.demand,
-            'desired_production': self.desired_production,
-            'desired_capital_stock': self.desired_capital_stock,
-            'labour_demand': self.labour_demand,
-            'desired_ei': self.desired_ei,
-            'desired_ri': self.desired_ri,
-            'supplier': self.supplier,
-            'expansion_investment': self.expansion_investment,
-            'replacement_investment': self.replacement_investment,
-            'production': self.production,
-            'output': self.output,
-            'inventory': self.inventory,
-            'sales': self.sales,
-            'profit': self.profit,
-            'liquid_assets': self.liquid_assets,
-            'capital_stock': self.capital_stock,
-            'debt_stock': self.debt_stock,
-            'price': self.price,
-            'upc': self.unit_production_cost,
-            'average_productivity': self.average_productivity,
-            'available_debt': self.available_debt,
-            'bankrupt': self.bankrupt
-        }
-        self.model.datacollector.add_table_row('consumption_firm', row)
-
         if self.bankrupt:
             return None
 
@@ -508,25 +424,44 @@ class ConsumptionGoodFirm(Firm):
 
 class CapitalGoodFirm(Firm):
 
-    # debt_stock = 0
-    # unit_production_cost = 1
-    demand = d(0)
-    output = d(0)
-    sales = d(0)
-    labour_demand = d(0)
-    profit = d(0)
-    orders = d(0)
+    __slots__ = ('machine', 'orders')
+
+    group = 'capital_firm'
+
+    # agent table columns: {column: (attribute, dtype)}
+    table_columns = {
+        'agent_id': ('unique_id', 'int64'),
+        'competitiveness': ('competitiveness', 'float64'),
+        'demand': ('demand', 'float64'),
+        'production': ('output', 'float64'),
+        'labour_demand': ('labour_demand', 'float64'),
+        'output': ('output', 'float64'),
+        'sales': ('sales', 'float64'),
+        'profit': ('profit', 'float64'),
+        'liquid_assets': ('liquid_assets', 'float64'),
+        'debt_stock': ('debt_stock', 'float64'),
+        'market_share': ('market_share', 'float64'),
+        'machine_generation': ('machine.generation', 'int64'),
+        'price': ('price', 'float64'),
+        'upc': ('unit_production_cost', 'float64'),
+        'labour_productivity': ('machine.labour_productivity_coefficient', 'float64'),
+        'available_debt': ('available_debt', 'float64'),
+        'bankrupt': ('bankrupt', 'bool')
+    }
 
     def __init__(self, unique_id, model, liquid_assets, market_share, **kwargs):
         super().__init__(unique_id, model, liquid_assets, market_share)
 
-        self.group = 'capital_firm'
+        self.demand = 0
+        self.output = 0
+        self.sales = 0
+        self.orders = 0
 
         self.machine = Machine(
             producer=unique_id,
             generation=1,
-            lpc=d(100),
-            price=d(1)
+            lpc=model.number(100),
+            price=model.number(1)
         )
 
     @property
@@ -594,16 +529,22 @@ class CapitalGoodFirm(Firm):
         return self.liquid_assets + self.profit
 
     def compute_market_share(self):
-        investment = self.model.investment
+        # share of all machines ordered in this step
+        total = self.model.order_book.total
         market_share = (
-            d(self.demand / investment) if investment > 0 else self.market_share
+            self.model.number(self.demand) / total if total > 0
+            else self.market_share
         )
         return market_share
 
     def innovate(self):
         if not self.model.innovation:
             return None
-        epsilon = d(self.random.uniform(*self.model.distribution_bounds))
+        low, high = self.model.distribution_bounds
+        epsilon = self.model.number(self.model.streams.uniform(
+            'innovation', self.model.schedule.steps, self.unique_id,
+            low=low, high=high
+        ))
         new_lpc = (
             self.machine.labour_productivity_coefficient
             * (1 + epsilon)
@@ -648,30 +589,6 @@ class CapitalGoodFirm(Firm):
             return None
 
     def stage_five(self):
-
-        row = {
-            'step': self.model.schedule.steps,
-            'agent_id': self.unique_id,
-            'competitiveness': self.competitiveness,
-            'demand': self.demand,
-            'production': self.output,
-            'labour_demand': self.labour_demand,
-            'output': self.output,
-            'sales': self.sales,
-            'profit': self.profit,
-            'liquid_assets': self.liquid_assets,
-            'debt_stock': self.debt_stock,
-            'market_share': self.market_share,
-            'machine_generation': self.machine.generation,
-            'price': self.price,
-            'upc': self.unit_production_cost,
-            'labour_productivity': self.machine.labour_productivity_coefficient,
-            'available_debt': self.available_debt,
-            'bankrupt': self.bankrupt
-        }
-
-        self.model.datacollector.add_table_row('capital_firm', row)
-
         if self.bankrupt:
             return None
 
@@ -0,0 +1,48 @@
+import pandas as pd
+
+
+class FirmArchive:
+    """Final state of the firms that exited the economy.
+
+    Each group is stored column-wise: one list per field of the firm's
+    ``table_row`` plus the step in which the firm exited.
+    """
+
+    def __init__(self, groups):
+        self.tables = {group: {} for group in groups}
+        self._index = {}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, unique_id):
+        return unique_id in self._index
+
+    def add(self, firm, exit_step):
+        record = firm.table_row()
+        record.pop('step')
+        record['exit_step'] = exit_step
+        table = self.tables[firm.group]
+        n_rows = len(table.get('agent_id', ()))
+        for field, value in record.items():
+            table.setdefault(field, []).append(value)
+        self._index[firm.unique_id] = (firm.group, n_rows)
+
+    def load(self, group, columns):
+        """Replace the records of ``group`` with ``columns``."""
+        self.tables[group] = columns
+        for unique_id in list(self._index):
+            if self._index[unique_id][0] == group:
+                del self._index[unique_id]
+        for row, unique_id in enumerate(columns.get('agent_id', [])):
+            self._index[unique_id] = (group, row)
+
+    def get(self, unique_id):
+        group, row = self._index[unique_id]
+        return {
+            field: values[row]
+            for field, values in self.tables[group].items()
+        }
+
+    def get_table_dataframe(self, group):
+        return pd.DataFrame(self.tables[group])
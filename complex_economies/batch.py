@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Headless batch runs of ComplexEconomy for sweeps and Monte Carlo seeds.
+
+Example, a 2 x 2 grid with 10 seeds each on all cores::
+
+    python -m complex_economies.batch --steps 600 --seeds 10 \\
+        --grid '{"mark_up": [0.2, 0.3], "wage_setting.cpi_weight": [0.5, 0.75]}' \\
+        --out results
+
+Override keys name an entry of ``benchmark_parameters`` or of the initial
+conditions; nested entries are addressed with dots. With ``--store`` the
+results are written run by run to a memory-mapped result store in ``--out``
+instead of CSV files, see ``complex_economies.store``.
+"""
+import argparse
+from copy import deepcopy
+import itertools
+import json
+import logging
+import math
+from multiprocessing import Pool, cpu_count
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import benchmark_parameters, initial_conditions
+from complex_economies.store import StoreWriter
+
+
+log = logging.getLogger(__name__)
+
+agent_tables = ['consumption_firm', 'capital_firm']
+
+
+def expand_grid(grid):
+    """Cartesian product of ``{key: [values]}`` as a list of overrides."""
+    keys = list(grid)
+    return [
+        dict(zip(keys, values))
+        for values in itertools.product(*(grid[k] for k in keys))
+    ]
+
+
+def apply_overrides(overrides):
+    """Return parameters and initial conditions with ``overrides`` applied."""
+    parameters = deepcopy(benchmark_parameters)
+    conditions = deepcopy(initial_conditions)
+    for key, value in overrides.items():
+        path = key.split('.')
+        target = conditions if path[0] in conditions else parameters
+        if path[0] not in target:
+            raise KeyError(
+                f'unknown parameter {key!r}, use one of '
+                f'{sorted([*parameters, *conditions])}'
+            )
+        for name in path[:-1]:
+            target = target[name]
+        target[path[-1]] = value
+    return parameters, conditions
+
+
+def make_runs(overrides=None, seeds=1, base_seed=0, steps=None,
+              agent_data=True):
+    """One run spec per combination of override set and seed."""
+    runs = []
+    for overrides_id, run_overrides in enumerate(overrides or [{}]):
+        for i in range(seeds):
+            runs.append({
+                'run_id': len(runs),
+                'overrides_id': overrides_id,
+                'overrides': run_overrides,
+                'seed': base_seed + i,
+                'steps': steps,
+                'agent_data': agent_data
+            })
+    return runs
+
+
+def run_single(run):
+    parameters, conditions = apply_overrides(run['overrides'])
+    steps = run['steps'] or parameters['sample_size']
+    model = ComplexEconomy(
+        parameters, seed=run['seed'], **conditions
+    )
+    for _ in range(steps):
+        model.step()
+
+    run_id = run['run_id']
+    model_data = model.datacollector.get_model_vars_dataframe()
+    model_data.index.name = 'step'
+    model_data = model_data.reset_index()
+    model_data.insert(0, 'run_id', run_id)
+    results = {'model': model_data}
+    if run['agent_data']:
+        for table in agent_tables:
+            # copy out of the recorder buffers before sending to the parent
+            agent_data = model.recorder.get_table_dataframe(table).copy()
+            agent_data.insert(0, 'run_id', run_id)
+            results[table] = agent_data
+    return run_id, results
+
+
+def run_batch(overrides=None, seeds=1, base_seed=0, steps=None,
+              processes=None, chunksize=None,
+              agent_data=True, progress=None, store=None):
+    """Run every override set for ``seeds`` seeds in a process pool.
+
+    Returns a dict of DataFrames: ``runs`` describes each run, ``model``
+    holds the model reporters and, if ``agent_data`` is set, one entry per
+    agent table. All frames carry a ``run_id`` column. ``progress`` is
+    called with ``(done, total)`` as runs finish.
+
+    If ``store`` is a path, the results of each run are appended to a result
+    store there as the run finishes, and only ``runs`` is returned.
+    """
+    runs = make_runs(overrides, seeds, base_seed, steps, agent_data)
+    processes = min(processes or cpu_count(), len(runs))
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(runs) / (4 * processes)))
+
+    collected = {}
+    writer = StoreWriter(store) if store is not None else None
+    with Pool(processes) as pool:
+        finished = pool.imap_unordered(run_single, runs, chunksize)
+        for done, (run_id, results) in enumerate(finished, 1):
+            if writer is None:
+                collected[run_id] = results
+            else:
+                # reporters switch between int and float, fix them to float
+                model_data = results['model']
+                results['model'] = model_data.astype({
+                    name: np.float64 for name in model_data
+                    if name not in ('run_id', 'step')
+                })
+                for name, data in results.items():
+                    writer.add(run_id, name, data)
+            log.info('finished run %s (%d/%d)', run_id, done, len(runs))
+            if progress is not None:
+                progress(done, len(runs))
+
+    output = {
+        'runs': pd.DataFrame([
+            {
+                'run_id': run['run_id'],
+                'overrides_id': run['overrides_id'],
+                'seed': run['seed'],
+                'overrides': json.dumps(run['overrides'])
+            } for run in runs
+        ])
+    }
+    if writer is not None:
+        return output
+    for name in collected[runs[0]['run_id']]:
+        output[name] = pd.concat(
+            [collected[run['run_id']][name] for run in runs],
+            ignore_index=True
+        )
+    return output
+
+
+def print_progress(done, total):
+    sys.stderr.write(f'\r{done}/{total} runs')
+    if done == total:
+        sys.stderr.write('\n')
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    overrides = parser.add_mutually_exclusive_group()
+    overrides.add_argument(
+        '--grid', help='JSON object mapping parameters to lists of values'
+    )
+    overrides.add_argument(
+        '--overrides', help='JSON list of parameter overrides, one per set'
+    )
+    parser.add_argument('--seeds', type=int, default=1,
+                        help='number of seeds per override set')
+    parser.add_argument('--base-seed', type=int, default=0)
+    parser.add_argument('--steps', type=int,
+                        help='steps per run, defaults to sample_size')
+    parser.add_argument('--processes', type=int,
+                        help='worker processes, defaults to all cores')
+    parser.add_argument('--chunksize', type=int)
+    parser.add_argument('--no-agent-data', action='store_true',
+                        help='only keep the model reporters')
+    parser.add_argument('--out', default='batch_results',
+                        help='directory for the CSV output')
+    parser.add_argument('--store', action='store_true',
+                        help='write a memory-mapped result store to --out')
+    args = parser.parse_args(argv)
+
+    if args.grid:
+        override_sets = expand_grid(json.loads(args.grid))
+    elif args.overrides:
+        override_sets = json.loads(args.overrides)
+    else:
+        override_sets = None
+
+    output = run_batch(
+        override_sets, seeds=args.seeds, base_seed=args.base_seed,
+        steps=args.steps, processes=args.processes,
+        chunksize=args.chunksize,
+        agent_data=not args.no_agent_data, progress=print_progress,
+        store=args.out if args.store else None
+    )
+    os.makedirs(args.out, exist_ok=True)
+    for name, data in output.items():
+        data.to_csv(os.path.join(args.out, f'{name}.csv'), index=False)
+
+
+if __name__ == '__main__':
+    main()
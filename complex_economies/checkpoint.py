@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""Save and restore the full state of a ComplexEconomy.
+
+A checkpoint is a single ``.npz`` file. Agent attributes are stored as one
+typed column per group and attribute, machines and other per-agent sequences
+as flat arrays with offsets, and the recorded data as the recorder's own
+columns. Scalars that do not fit a column, the parameters and the RNG state
+go into a JSON header stored in the same file. Restoring rebuilds the model
+from these arrays without replaying its construction, so a run continues
+exactly as it would have without the checkpoint::
+
+    save_checkpoint(model, 'burn_in.npz')
+    model = load_checkpoint('burn_in.npz')
+
+Set ``model.checkpointer = Checkpointer('run/step_{step}.npz', every=100)``
+to write checkpoints periodically during a long run.
+"""
+from collections import deque
+from decimal import Decimal
+import json
+import os
+import random
+
+import numpy as np
+
+from complex_economies.agents import Machine
+from complex_economies.model import ComplexEconomy
+from complex_economies.streams import RandomStreams
+from complex_economies.vintages import MachineStock
+
+
+FORMAT_VERSION = 1
+
+scalar_types = (bool, int, float, str, type(None), Decimal, np.generic)
+
+
+def encode_json(value):
+    # with the decimal backend, exact values are kept as strings
+    if isinstance(value, Decimal):
+        return {'decimal': str(value)}
+    raise TypeError(f'cannot checkpoint {type(value).__name__} {value!r}')
+
+
+def decode_json(obj):
+    if len(obj) == 1 and 'decimal' in obj:
+        return Decimal(obj['decimal'])
+    return obj
+
+
+def encode_column(values):
+    """Return ``values`` as a bool, int64 or float64 array, or ``None`` if
+    they have to go to the JSON header (``None``, strings, ...).
+    """
+    array = np.asarray(values)
+    if array.dtype.kind == 'b':
+        return array
+    if array.dtype.kind == 'i':
+        return array.astype(np.int64, copy=False)
+    if array.dtype.kind == 'f':
+        return array.astype(np.float64, copy=False)
+    return None
+
+
+def decode_column(array):
+    # tolist gives back Python bools, ints and floats
+    return array.tolist()
+
+
+class _Writer:
+    def __init__(self):
+        self.arrays = {}
+        self.json = {}
+
+    def column(self, key, values):
+        array = encode_column(values)
+        if array is None:
+            self.json[key] = [
+                v.item() if isinstance(v, np.generic) else v for v in values
+            ]
+        else:
+            self.arrays[key] = array
+
+    def ragged(self, key, sequences):
+        lengths = [len(s) for s in sequences]
+        self.arrays[f'{key}/offsets'] = np.cumsum([0] + lengths)
+        if sequences and all(isinstance(s, np.ndarray) for s in sequences):
+            self.arrays[f'{key}/values'] = np.concatenate(sequences)
+        else:
+            self.column(f'{key}/values', [v for s in sequences for v in s])
+
+
+class _Reader:
+    def __init__(self, arrays, json_columns):
+        self.arrays = arrays
+        self.json = json_columns
+
+    def column(self, key):
+        if key in self.json:
+            return self.json[key]
+        return decode_column(self.arrays[key])
+
+    def array(self, key):
+        if key in self.json:
+            return self.json[key]
+        return self.arrays[key]
+
+    def ragged(self, key):
+        offsets = self.arrays[f'{key}/offsets']
+        values = self.column(f'{key}/values')
+        return [
+            values[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])
+        ]
+
+
+def slot_names(cls):
+    """Names of the ``__slots__`` of ``cls`` and its bases, bases first."""
+    names = []
+    for base in reversed(cls.__mro__):
+        slots = getattr(base, '__slots__', ())
+        names.extend([slots] if isinstance(slots, str) else slots)
+    return names
+
+
+def _save_agents(writer, prefix, agents):
+    attributes = {}
+    for cls in dict.fromkeys(type(agent) for agent in agents):
+        attributes.update(dict.fromkeys(slot_names(cls)))
+    attributes.pop('model', None)
+    attributes.pop('pos', None)
+
+    kinds = {}
+    for name in attributes:
+        key = f'{prefix}/{name}'
+        values = [getattr(agent, name, None) for agent in agents]
+        present = [hasattr(agent, name) for agent in agents]
+        if not any(present):
+            continue
+        if not all(present):
+            writer.arrays[f'{key}/present'] = np.array(present)
+        sample = next(v for v, p in zip(values, present) if p)
+        if isinstance(sample, MachineStock):
+            kinds[name] = 'machine_stock'
+            writer.ragged(f'{key}/vintages', [v.vintages for v in values])
+            writer.ragged(f'{key}/stock', [v.stock for v in values])
+            # running sums, so that restored firms keep the same rounding
+            writer.column(f'{key}/total', [v._total for v in values])
+            writer.column(
+                f'{key}/productivity', [v._productivity for v in values]
+            )
+        elif isinstance(sample, Machine):
+            kinds[name] = 'machine'
+            for field in ('producer', 'generation',
+                          'labour_productivity_coefficient', 'price'):
+                writer.column(
+                    f'{key}/{field}', [getattr(v, field) for v in values]
+                )
+        elif isinstance(sample, deque):
+            kinds[name] = 'deque'
+            writer.json[f'{key}/maxlen'] = sample.maxlen
+            writer.ragged(key, values)
+        elif isinstance(sample, list):
+            kinds[name] = 'list'
+            writer.ragged(key, values)
+        elif isinstance(sample, scalar_types):
+            kinds[name] = 'scalar'
+            writer.column(key, values)
+        else:
+            raise TypeError(
+                f'cannot checkpoint attribute {name!r} of type '
+                f'{type(sample).__name__}'
+            )
+    return kinds
+
+
+def _load_agents(reader, prefix, kinds, model, cls, n_agents):
+    agents = [cls.__new__(cls) for _ in range(n_agents)]
+    for agent in agents:
+        agent.model = model
+        agent.pos = None
+    for name, kind in kinds.items():
+        key = f'{prefix}/{name}'
+        if kind == 'machine_stock':
+            vintages = reader.ragged(f'{key}/vintages')
+            stock = reader.ragged(f'{key}/stock')
+            values = []
+            for v, s, total, productivity in zip(
+                vintages, stock, reader.column(f'{key}/total'),
+                reader.column(f'{key}/productivity')
+            ):
+                machines = MachineStock(model.vintages, v, s)
+                machines._total = total
+                machines._productivity = productivity
+                values.append(machines)
+        elif kind == 'machine':
+            values = [
+                Machine(*fields) for fields in zip(*(
+                    reader.column(f'{key}/{field}')
+                    for field in ('producer', 'generation',
+                                  'labour_productivity_coefficient', 'price')
+                ))
+            ]
+        elif kind == 'deque':
+            maxlen = reader.json[f'{key}/maxlen']
+            values = [deque(v, maxlen=maxlen) for v in reader.ragged(key)]
+        elif kind == 'list':
+            values = reader.ragged(key)
+        else:
+            values = reader.column(key)
+        present = reader.arrays.get(f'{key}/present')
+        for i, (agent, value) in enumerate(zip(agents, values)):
+            if present is None or present[i]:
+                setattr(agent, name, value)
+    return agents
+
+
+def save_checkpoint(model, path, compress=False):
+    """Write the full state of ``model`` to ``path``.
+
+    ``compress`` zips the arrays, which makes the file several times smaller
+    but slower to write.
+    """
+    writer = _Writer()
+    schedule = model.schedule
+    meta = {
+        'version': FORMAT_VERSION,
+        'numeric': model.numeric.name,
+        'parameters': model.parameters,
+        'seed': model._seed,
+        'random': model.random.getstate(),
+        'streams': model.streams.entropy,
+        'model': {
+            name: value.item() if isinstance(value, np.generic) else value
+            for name, value in vars(model).items()
+            if isinstance(value, scalar_types)
+        },
+        'schedule': {
+            'steps': schedule.steps,
+            'time': schedule.time,
+            'stage': schedule.stage
+        },
+        'agents': {},
+        'recorder': {},
+        'archive': {}
+    }
+
+    # agents, in schedule order within each group
+    for group in model.groups:
+        agents = model.get_group(group, include_bankrupt=True)
+        meta['agents'][group] = {
+            'count': len(agents),
+            'kinds': _save_agents(writer, f'agents/{group}', agents)
+        }
+
+    registry = model.vintages
+    writer.arrays['vintages/producer'] = registry.producer[:registry.size]
+    writer.arrays['vintages/generation'] = registry.generation[:registry.size]
+    writer.arrays['vintages/lpc'] = registry.lpc
+
+    # collected data
+    for name, values in model.datacollector.model_vars.items():
+        writer.column(f'model_vars/{name}', values)
+    for table, columns in model.recorder.tables.items():
+        meta['recorder'][table] = len(columns)
+        for name in columns.buffers:
+            writer.column(f'recorder/{table}/{name}', columns.column(name))
+    for group, columns in model.archive.tables.items():
+        meta['archive'][group] = list(columns)
+        for name, values in columns.items():
+            writer.column(f'archive/{group}/{name}', values)
+
+    meta['json'] = writer.json
+    writer.arrays['meta'] = np.frombuffer(
+        json.dumps(meta, default=encode_json).encode(), dtype=np.uint8
+    )
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    save = np.savez_compressed if compress else np.savez
+    with open(path, 'wb') as f:
+        save(f, **writer.arrays)
+
+
+def load_checkpoint(path):
+    """Restore a model written by ``save_checkpoint``."""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    meta = json.loads(arrays.pop('meta').tobytes(), object_hook=decode_json)
+    if meta['version'] != FORMAT_VERSION:
+        raise ValueError(
+            f'unsupported checkpoint version {meta["version"]}'
+        )
+    reader = _Reader(arrays, meta['json'])
+
+    # bypass Model.__new__, which reseeds the RNG shared through the class
+    model = object.__new__(ComplexEconomy)
+    model._seed = meta['seed']
+    version, state, gauss_next = meta['random']
+    model.random = random.Random()
+    model.random.setstate((version, tuple(state), gauss_next))
+    model.setup(meta['parameters'], meta.get('numeric', 'float'))
+    model.streams = RandomStreams(meta['streams'])
+    for name, value in meta['model'].items():
+        setattr(model, name, value)
+
+    model.vintages.load(
+        arrays['vintages/producer'], arrays['vintages/generation'],
+        arrays['vintages/lpc']
+    )
+
+    for group in model.groups:
+        info = meta['agents'][group]
+        agents = _load_agents(
+            reader, f'agents/{group}', info['kinds'], model,
+            model.firm_classes[group], info['count']
+        )
+        for agent in agents:
+            model.schedule.add(agent)
+    for name, value in meta['schedule'].items():
+        setattr(model.schedule, name, value)
+
+    for name in model.datacollector.model_vars:
+        model.datacollector.model_vars[name] = reader.column(f'model_vars/{name}')
+    for table, size in meta['recorder'].items():
+        columns = model.recorder.tables[table]
+        columns.append({
+            name: reader.array(f'recorder/{table}/{name}')
+            for name in columns.buffers
+        }, size)
+    for group, fields in meta['archive'].items():
+        model.archive.load(group, {
+            name: reader.column(f'archive/{group}/{name}') for name in fields
+        })
+    return model
+
+
+class Checkpointer:
+    """Writes a checkpoint every ``every`` steps.
+
+    ``path`` is formatted with the step number, e.g. ``'run/step_{step}.npz'``.
+    Assign an instance to ``model.checkpointer`` to enable it.
+    """
+
+    def __init__(self, path, every, compress=False):
+        self.path = path
+        self.every = every
+        self.compress = compress
+
+    def __call__(self, model):
+        step = model.schedule.steps
+        if step % self.every == 0:
+            save_checkpoint(model, self.path.format(step=step), self.compress)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""The capital goods market, cleared for all consumption firms at once."""
+import numpy as np
+
+
+def sample_without_replacement(streams, step, agents, population, k):
+    """Draw a sample of ``k`` distinct indices for each of ``agents``.
+
+    The draws come from the ``'supplier'`` stream of each agent. Rows with a
+    repeated index are drawn again with the next ``k`` draws of the agent,
+    which keeps every ordered sample equally likely and is cheap when ``k``
+    is small next to the population.
+    """
+    agents = np.asarray(agents, dtype=np.int64)[:, None]
+    draws = np.arange(k)
+    samples = streams.integers('supplier', step, agents, population, draws)
+    attempt = 0
+    while k > 1:
+        ordered = np.sort(samples, axis=1)
+        repeated = np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))
+        if not len(repeated):
+            break
+        attempt += 1
+        samples[repeated] = streams.integers(
+            'supplier', step, agents[repeated], population,
+            attempt * k + draws
+        )
+    return samples
+
+
+class OfferTable:
+    """Machines offered by the live capital firms in the current step.
+
+    Built once per step after the capital firms have set their prices.
+    """
+
+    def __init__(self, capital_firms):
+        self.firms = capital_firms
+        self.suppliers = np.array(
+            [f.unique_id for f in capital_firms], dtype=np.int64
+        )
+        self.prices = np.array(
+            [f.machine.price for f in capital_firms], dtype=np.float64
+        )
+        self.unit_costs = np.array(
+            [f.unit_production_cost for f in capital_firms], dtype=np.float64
+        )
+        self.ratios = np.array(
+            [f.machine.lpc_price_ratio for f in capital_firms], dtype=np.float64
+        )
+        self._index = {
+            supplier: i for i, supplier in enumerate(self.suppliers.tolist())
+        }
+
+    def __len__(self):
+        return len(self.suppliers)
+
+    def index(self, suppliers):
+        """Row of each supplier id, ``-1`` if it is not offering."""
+        index = self._index
+        return np.fromiter(
+            (index.get(s, -1) for s in suppliers), dtype=np.int64,
+            count=len(suppliers)
+        )
+
+    def price_of(self, suppliers):
+        return self.prices[self.index(suppliers)]
+
+    def choose_suppliers(self, streams, step, buyers, current, brochures=10):
+        """Supplier of each consumption firm given its ``current`` one.
+
+        Each firm sees the machines of ``brochures`` random capital firms and
+        switches to the best lpc to price ratio among them, unless its current
+        supplier is still offering and has an equal or better ratio.
+        ``buyers`` are the ids of the firms, which select their random streams.
+        """
+        samples = sample_without_replacement(
+            streams, step, buyers, len(self), min(brochures, len(self))
+        )
+        sample_ratios = self.ratios[samples]
+        # argmax takes the first of equal ratios, in sample order
+        best = samples[
+            np.arange(len(samples)), np.argmax(sample_ratios, axis=1)
+        ]
+        current_row = self.index(current)
+        current_ratio = np.where(
+            current_row >= 0, self.ratios[current_row], -np.inf
+        )
+        switch = self.ratios[best] > current_ratio
+        return np.where(
+            switch, self.suppliers[best], self.suppliers[current_row]
+        )
+
+
+class OrderBook:
+    """Machine orders of the consumption firms in the current step.
+
+    A sparse table with one entry per buyer with a positive order: the buyer,
+    the row of its supplier in the ``OfferTable`` and the quantity. Collected
+    after the consumption firms fixed their investment in stage two, and
+    settled after the capital firms produced in stage three. ``quantities``
+    are in the model's number type, ``dtype`` is ``object`` for ``Decimal``.
+    """
+
+    def __init__(self, offers, buyers, quantities, dtype=np.float64):
+        quantities = np.array(quantities, dtype=dtype)
+        placed = np.flatnonzero((quantities > 0).astype(bool))
+        self.buyers = [buyers[i] for i in placed.tolist()]
+        self.suppliers = offers.index([f.supplier for f in self.buyers])
+        self.quantities = quantities[placed]
+        # orders per supplier, in the order the buyers placed them
+        self.demand = np.zeros(len(offers), dtype=dtype)
+        np.add.at(self.demand, self.suppliers, self.quantities)
+        self.total = sum(self.quantities.tolist())
+
+    def __len__(self):
+        return len(self.buyers)
+
+    def settle(self, output, prices, expansion):
+        """Ration the orders of suppliers that produced less than demanded.
+
+        ``output`` and ``prices`` are per supplier row, ``expansion`` is the
+        expansion investment of each buyer in the book. Each buyer of a
+        rationed supplier receives its pro-rata share of the output, rounded
+        down, cut from its replacement investment first. Returns the rationed
+        buyers with their new expansion and replacement investment and the
+        amount reimbursed to them.
+        """
+        rationed = np.flatnonzero(
+            (output < self.demand).astype(bool)[self.suppliers]
+        )
+        supplier = self.suppliers[rationed]
+        share = self.quantities[rationed] / self.demand[supplier]
+        # truncates like int(), also for Decimal
+        # TODO: assign residual orders to firms
+        received = (share * output[supplier]).astype(np.int64)
+        expansion = np.minimum(received, expansion[rationed])
+        replacement = received - expansion
+        # NOTE: as in the firm level rule, this is the value of the machines
+        # received, not of those rationed away
+        reimbursement = received * prices[supplier]
+        buyers = [self.buyers[i] for i in rationed.tolist()]
+        return buyers, expansion, replacement, reimbursement
+
+
+def plan_replacements(offers, firms, lpc, market_wage, payback_period):
+    """Apply the payback rule to every machine of every consumption firm.
+
+    A vintage in use is scrapped if the price of the firm's supplier's
+    machine is paid back by the saving in unit cost within
+    ``payback_period``. Returns the vintages to scrap per firm and the stock
+    they hold, which is the desired replacement investment.
+    """
+    lengths = np.fromiter(
+        (len(f.machines) for f in firms), dtype=np.int64, count=len(firms)
+    )
+    owner = np.repeat(np.arange(len(firms)), lengths)
+    vintages = np.concatenate([f.machines.vintages for f in firms])
+    stock = np.concatenate([f.machines.stock for f in firms])
+    supplier = offers.index([f.supplier for f in firms])[owner]
+
+    cost_gap = market_wage / lpc[vintages] - offers.unit_costs[supplier]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = offers.prices[supplier] / cost_gap
+    scrap = (stock > 0) & (cost_gap != 0) & (payback <= payback_period)
+
+    replacement = np.bincount(
+        owner[scrap], weights=stock[scrap], minlength=len(firms)
+    )
+    counts = np.bincount(owner[scrap], minlength=len(firms))
+    want_to_scrap = [
+        v.tolist() for v in np.split(vintages[scrap], np.cumsum(counts)[:-1])
+    ]
+    return want_to_scrap, replacement
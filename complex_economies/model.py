@@ -5,16 +5,25 @@ from pprint import pformat
 
 from mesa import Model
 from mesa.datacollection import DataCollector
+import numpy as np
 
 from complex_economies.agents import CapitalGoodFirm, ConsumptionGoodFirm
+from complex_economies.archive import FirmArchive
+from complex_economies.market import OfferTable, OrderBook, plan_replacements
+from complex_economies.numeric import backends
+from complex_economies.profiling import StageProfiler, clock
+from complex_economies.recorder import TableRecorder
+from complex_economies.reductions import Reduction
+from complex_economies.streams import RandomStreams
 from complex_economies.schedule import GroupedActivation
 from complex_economies.utils import messages
-from complex_economies.utils.misc import d
+from complex_economies.utils.cache import StageCache
+from complex_economies.vintages import VintageRegistry
 
 
 def gov_base_consumption(model):
     government_consumption = (
-        d(model.wage_share) * model.market_wage * model.labour_supply
+        model.wage_share * model.market_wage * model.labour_supply
     )
     return government_consumption
 
@@ -31,11 +40,9 @@ social_policy = {
 
 
 def compute_gdp(model):
-    consumption_firms = model.get_group('consumption_firm')
-    capital_firms = model.get_group('capital_firm')
     return (
-        sum([f.sales * f.price for f in consumption_firms])
-        + sum([f.output * f.price for f in capital_firms])
+        model.sector('consumption_firm', 'gdp')['revenue']
+        + model.sector('capital_firm', 'gdp')['revenue']
     )
 
 
@@ -49,10 +56,13 @@ class ComplexEconomy(Model):
             'update_average_prices',
             'update_avg_ulc',
             'update_average_labour_productivity',
-            'update_sector_competitiveness'
+            'update_sector_competitiveness',
+            'select_suppliers',
+            'plan_replacements'
         ],
         'stage_two': [
-            'aggregate_investment'
+            'aggregate_investment',
+            'collect_orders'
         ],
         'stage_three': [
             'update_labour_supply',
@@ -63,150 +73,149 @@ class ComplexEconomy(Model):
         ],
         'stage_four': [
             'aggregate_production',
-            'aggregate_inventories'
+            'aggregate_inventories',
+            'record_tables',
+            'settle_orders'
         ],
         'stage_five': [
             'exit_and_entry'
         ]
     }
 
-    avg_cap_price = d(0)
-    avg_comp_competitiveness = d(0)
-    avg_cap_competitiveness = d(0)
-    average_unit_labour_cost = d(0)
-    consumption_labour_demand = d(0)
-    unemployment = d(0)
-    delta_cpi = d(0)
-    delta_productivity = d(0)
-    delta_unemployment = d(0)
-    expansion_investment = d(0)
-    replacement_investment = d(0)
-    agg_inventories = d(0)
-    agg_production = d(0)
+    # derived quantities cached per stage, with the events that change them
+    cached_quantities = {
+        'labour_demand': [
+            ('capital_firm', 'stage_three'), 'aggregate_labour_demand',
+            'exit_and_entry'
+        ],
+        'investment': ['aggregate_investment'],
+        'max_capital_labour': ['update_labour_supply']
+    }
 
-    def __init__(self, parameters, market_wage, cpi, avg_labour_productivity,
-                 liquid_assets, capital_stock, labour_supply, innovation,
-                 seed=None):
-        self.schedule = GroupedActivation(
-            self, self.groups, self.stages,
-            interim_functions=self.stage_functions
-        )
-        self.datacollector = DataCollector(
-            model_reporters={
-                'market_wage': 'market_wage',
-                'consumption': 'consumption',
-                'expansion_investment': 'expansion_investment',
-                'replacement_investment': 'replacement_investment',
-                'investment': 'investment',
-                'inventories': 'agg_inventories',
-                'production': 'agg_production',
-                'cpi': 'cpi',
-                'avg_cap_price': 'avg_cap_price',
-                'avg_labour_prod': 'avg_labour_prod',
-                'labour_supply': 'labour_supply',
-                'labour_demand': 'labour_demand',
-                'employment': 'employment',
-                'unemployment': 'unemployment',
-                'avg_comp_competitiveness': 'avg_comp_competitiveness',
-                'avg_cap_competitiveness': 'avg_cap_competitiveness',
-                'gdp': compute_gdp
+    # sector aggregates read by the interim functions and reporters, per group
+    # and part of the step: {group: {name: {aggregate: (kind, *fields)}}}.
+    # Each is computed in one pass over the group, see ``sector``.
+    sector_reductions = {
+        'consumption_firm': {
+            'prices': {
+                'avg_price': ('mean', 'price'),
+                'competitiveness': (
+                    'weighted', 'competitiveness', 'market_share'
+                )
+            },
+            'weighted_prices': {
+                'avg_price': ('weighted', 'price', 'market_share')
+            },
+            'investment': {
+                'expansion_investment': ('sum', 'expansion_investment'),
+                'replacement_investment': ('sum', 'replacement_investment')
+            },
+            'labour': {
+                'labour_demand': ('sum', 'labour_demand')
+            },
+            'output': {
+                'production': ('sum', 'production'),
+                'inventory': ('sum', 'inventory')
             },
-            tables={
-                'consumption_firm': {
-                    'step': [],
-                    'agent_id': [],
-                    'competitiveness': [],
-                    'expected_demand': [],
-                    'market_share': [],
-                    'demand': [],
-                    'desired_production': [],
-                    'desired_capital_stock': [],
-                    'labour_demand': [],
-                    'desired_ei': [],
-                    'desired_ri': [],
-                    'supplier': [],
-                    'expansion_investment': [],
-                    'replacement_investment': [],
-                    'production': [],
-                    'output': [],
-                    'inventory': [],
-                    'sales': [],
-                    'profit': [],
-                    'liquid_assets': [],
-                    'capital_stock': [],
-                    'debt_stock': [],
-                    'price': [],
-                    'upc': [],
-                    'average_productivity': [],
-                    'available_debt': [],
-                    'bankrupt': []
-                },
-                'capital_firm': {
-                    'step': [],
-                    'agent_id': [],
-                    'competitiveness': [],
-                    'demand': [],
-                    'production': [],
-                    'labour_demand': [],
-                    'output': [],
-                    'sales': [],
-                    'profit': [],
-                    'liquid_assets': [],
-                    'debt_stock': [],
-                    'market_share': [],
-                    'machine_generation': [],
-                    'price': [],
-                    'upc': [],
-                    'labour_productivity': [],
-                    'available_debt': [],
-                    'bankrupt': []
-                }
+            'gdp': {
+                'revenue': ('weighted', 'sales', 'price')
             }
-        )
-        self.innovation = innovation
-        self.social_policy = parameters['social_policy']
-        self.inventory_deprecation = parameters['inventory_deprecation']
+        },
+        'capital_firm': {
+            'prices': {
+                'avg_price': ('mean', 'price'),
+                'competitiveness': (
+                    'weighted', 'competitiveness', 'market_share'
+                ),
+                'avg_labour_prod': (
+                    'weighted', 'machine.labour_productivity_coefficient',
+                    'market_share'
+                ),
+                'mean_reciprocal_lpc': (
+                    'reciprocal_mean', 'machine.labour_productivity_coefficient'
+                )
+            },
+            'weighted_prices': {
+                'avg_price': ('weighted', 'price', 'market_share')
+            },
+            'unweighted_productivity': {
+                'avg_labour_prod': (
+                    'mean', 'machine.labour_productivity_coefficient'
+                )
+            },
+            'labour': {
+                'labour_demand': ('sum', 'labour_demand')
+            },
+            'gdp': {
+                'revenue': ('weighted', 'output', 'price')
+            }
+        }
+    }
 
-        # parameters  # TODO: convert parameters to decimal
+    firm_classes = {
+        'consumption_firm': ConsumptionGoodFirm,
+        'capital_firm': CapitalGoodFirm
+    }
+    model_reporters = {
+        'market_wage': 'market_wage',
+        'consumption': 'consumption',
+        'expansion_investment': 'expansion_investment',
+        'replacement_investment': 'replacement_investment',
+        'investment': 'investment',
+        'inventories': 'agg_inventories',
+        'production': 'agg_production',
+        'cpi': 'cpi',
+        'avg_cap_price': 'avg_cap_price',
+        'avg_labour_prod': 'avg_labour_prod',
+        'labour_supply': 'labour_supply',
+        'labour_demand': 'labour_demand',
+        'employment': 'employment',
+        'unemployment': 'unemployment',
+        'avg_comp_competitiveness': 'avg_comp_competitiveness',
+        'avg_cap_competitiveness': 'avg_cap_competitiveness',
+        'gdp': compute_gdp
+    }
+
+    avg_cap_price = 0
+    avg_comp_competitiveness = 0
+    avg_cap_competitiveness = 0
+    average_unit_labour_cost = 0
+    consumption_labour_demand = 0
+    unemployment = 0
+    delta_cpi = 0
+    delta_productivity = 0
+    delta_unemployment = 0
+    expansion_investment = 0
+    replacement_investment = 0
+    agg_inventories = 0
+    agg_production = 0
+
+    def __init__(self, parameters, market_wage, cpi, avg_labour_productivity,
+                 liquid_assets, capital_stock, labour_supply, innovation,
+                 seed=None, profile=False, tracer=None,
+                 numeric='float'):
+        self.setup(parameters, numeric)
+        if profile:
+            self.profiler = self.schedule.profiler = StageProfiler()
+        self.tracer = self.schedule.tracer = tracer
+        self.innovation = innovation
         n_consumption_firms = parameters['n_consumption_firms']
         n_capital_firms = parameters['n_capital_firms']
-        replicators = parameters['replicator_dynamics_coeff']
-        self.replicator_dynamics_coeff = (d(replicators[0]), d(replicators[1]))
-        comp_weights = parameters['competitiveness_weights']
-        self.competitiveness_weights = (
-            (d(comp_weights[0][0]), d(comp_weights[0][1])),
-            (d(comp_weights[1][0]), d(comp_weights[1][1]))
-        )
-        self.distribution_bounds = parameters['distribution_bounds']
-        self.labour_supply_growth = d(parameters['labour_supply_growth'])
-        self.wage_setting = {
-            k: d(v) for k, v in
-            parameters['wage_setting'].items()
-        }
-        self.desired_capital_utilization = d(parameters['desired_capital_utilization'])
-        self.trigger_rule = d(parameters['trigger_rule'])
-        self.payback_period_parameter = d(parameters['payback_period_parameter'])
-        self.mark_up = d(parameters['mark_up'])
-        self.interest_rate = d(parameters['interest_rate'])
-        self.wage_share = d(parameters['wage_share'])
-        self.betas = [d(b) for b in parameters['betas']]
-        # NOTE: max_debt_sales_ratio is not specified in the paper
-        self.max_debt_sales_ratio = d(parameters['max_debt_sales_ratio'])
 
         # initial conditions
-        self.market_wage = d(market_wage)
-        self.cpi = d(cpi)
-        self.avg_labour_prod = d(avg_labour_productivity)
-        self.labour_supply = labour_supply
+        self.market_wage = self.number(market_wage)
+        self.cpi = self.number(cpi)
+        self.avg_labour_prod = self.number(avg_labour_productivity)
+        self.labour_supply = self.number(labour_supply)
 
         # computed and derived
-        self.max_capital_labour_share = d(
-            n_capital_firms / (n_consumption_firms + n_capital_firms)
+        init_market_share = (
+            self.number(1) / n_consumption_firms,
+            self.number(1) / n_capital_firms
         )
-        init_market_share = (d(1 / n_consumption_firms), d(1 / n_capital_firms))
-        self.employment = labour_supply
+        self.employment = self.labour_supply
         self.consumption = self.compute_consumption()
-        self.unemployment_rate = d(self.unemployment / self.employment)
+        self.unemployment_rate = self.unemployment / self.employment
 
         # create capital good firms
         for i in range(n_capital_firms):
@@ -225,58 +234,160 @@ class ComplexEconomy(Model):
                 init_market_share[0], supplier=supplier
             )
             self.schedule.add(f)
+        self.current_id = n_capital_firms + n_consumption_firms - 1
 
         self.running = True
         self.datacollector.collect(self)
 
-        self.log.info(messages.model_init_message.format(
-            wage=self.market_wage,
-            cpi=self.cpi,
-            avg_labour_prod=self.avg_labour_prod,
-            labour_supply=self.labour_supply,
-            comp_market_share=init_market_share[0],
-            cap_market_share=init_market_share[1],
-            employment=self.employment,
-            consumption=self.consumption,
-            unemployment_rate=self.unemployment_rate,
-            parameters=pformat(parameters)
-        ))
+        if self.log.isEnabledFor(logging.INFO):
+            self.log.info(messages.model_init_message.format(
+                wage=self.market_wage,
+                cpi=self.cpi,
+                avg_labour_prod=self.avg_labour_prod,
+                labour_supply=self.labour_supply,
+                comp_market_share=init_market_share[0],
+                cap_market_share=init_market_share[1],
+                employment=self.employment,
+                consumption=self.consumption,
+                unemployment_rate=self.unemployment_rate,
+                parameters=pformat(parameters)
+            ))
+
+    def setup(self, parameters, numeric='float'):
+        """Create the model components and set the parameters.
+
+        Used by ``__init__`` and when restoring a checkpoint.
+        """
+        if numeric not in backends:
+            raise ValueError(f'unknown numeric backend {numeric!r}, use one of {list(backends)}')
+        self.numeric = backends[numeric]()
+        self.numeric.activate()
+        # converts parameters and values from outside the accounting
+        self.number = self.numeric.number
+        self.parameters = parameters
+        self.reductions = {
+            group: {
+                name: Reduction(aggregates)
+                for name, aggregates in reductions.items()
+            }
+            for group, reductions in self.sector_reductions.items()
+        }
+        # the reduced fields only change in the group's stages and on entry
+        dependencies = dict(self.cached_quantities)
+        for group, reductions in self.reductions.items():
+            events = [(group, stage) for stage in self.stages]
+            for name in reductions:
+                dependencies[f'{group}.{name}'] = events + ['exit_and_entry']
+        self.cache = StageCache(dependencies)
+        self.schedule = GroupedActivation(
+            self, self.groups, self.stages,
+            interim_functions=self.stage_functions,
+            cache=self.cache
+        )
+        self.archive = FirmArchive(self.groups)
+        # with debug_machines, running machine totals are checked on every read
+        self.vintages = VintageRegistry(
+            debug=parameters.get('debug_machines', False)
+        )
+        self.datacollector = DataCollector(model_reporters=self.model_reporters)
+        self.recorder = TableRecorder(
+            {group: cls.table_columns for group, cls in self.firm_classes.items()},
+            real_dtype=self.numeric.dtype,
+            decimals=self.numeric.record_decimals
+        )
+        # called with the model after every step, see complex_economies.checkpoint
+        self.checkpointer = None
+        # takes the collected data after every step, see complex_economies.sink
+        self.sink = None
+        # records where step time goes when the model is created with profile=True
+        self.profiler = None
+        # writes watched agents after each stage, see complex_economies.tracing
+        self.tracer = None
+        # random draws per firm and purpose, see complex_economies.streams
+        self.streams = RandomStreams(self._seed)
+        # machines on offer in the current step, built by select_suppliers
+        self.offers = None
+        # machines ordered in the current step, built by collect_orders
+        self.order_book = None
+        self.social_policy = parameters['social_policy']
+        self.inventory_deprecation = self.number(parameters['inventory_deprecation'])
+        self.n_brochures = parameters.get('n_brochures', 10)
+
+        # parameters
+        n_consumption_firms = parameters['n_consumption_firms']
+        n_capital_firms = parameters['n_capital_firms']
+        replicators = parameters['replicator_dynamics_coeff']
+        self.replicator_dynamics_coeff = (
+            self.number(replicators[0]), self.number(replicators[1])
+        )
+        comp_weights = parameters['competitiveness_weights']
+        self.competitiveness_weights = (
+            (self.number(comp_weights[0][0]), self.number(comp_weights[0][1])),
+            (self.number(comp_weights[1][0]), self.number(comp_weights[1][1]))
+        )
+        self.distribution_bounds = parameters['distribution_bounds']
+        self.labour_supply_growth = self.number(parameters['labour_supply_growth'])
+        self.wage_setting = {
+            k: self.number(v) for k, v in
+            parameters['wage_setting'].items()
+        }
+        self.desired_capital_utilization = self.number(parameters['desired_capital_utilization'])
+        self.trigger_rule = self.number(parameters['trigger_rule'])
+        self.payback_period_parameter = self.number(parameters['payback_period_parameter'])
+        self.mark_up = self.number(parameters['mark_up'])
+        self.interest_rate = self.number(parameters['interest_rate'])
+        self.wage_share = self.number(parameters['wage_share'])
+        self.betas = [self.number(b) for b in parameters['betas']]
+        # with myopic expectations, expected demand is last period's demand
+        self.myopic = parameters.get('myopic', True)
+        # NOTE: max_debt_sales_ratio is not specified in the paper
+        self.max_debt_sales_ratio = self.number(parameters['max_debt_sales_ratio'])
+
+        # computed and derived
+        self.max_capital_labour_share = (
+            self.number(n_capital_firms) / (n_consumption_firms + n_capital_firms)
+        )
 
     @property
     def investment(self):
-        return self.expansion_investment + self.replacement_investment
+        return self.cache.get('investment', self.compute_investment)
 
     @property
     def max_capital_labour(self):
-        return self.max_capital_labour_share * self.labour_supply
+        return self.cache.get('max_capital_labour', self.compute_max_capital_labour)
 
     @property
     def capital_labour_demand(self):
-        capital_firms = self.get_group('capital_firm')
-        return sum([a.labour_demand for a in capital_firms])
-    
+        return self.sector('capital_firm', 'labour')['labour_demand']
+
     @property
     def labour_demand(self):
+        return self.cache.get('labour_demand', self.compute_labour_demand)
+
+    def compute_investment(self):
+        return self.expansion_investment + self.replacement_investment
+
+    def compute_max_capital_labour(self):
+        return self.max_capital_labour_share * self.labour_supply
+
+    def compute_labour_demand(self):
         return self.capital_labour_demand + self.consumption_labour_demand
 
     def get_group(self, group, include_bankrupt=False, bankrupt_only=False):
-        if include_bankrupt and bankrupt_only:
-            raise ValueError('include_bankrupt and bankrupt_only are mutually exclusive')
-        firms = [
-            a for a in self.schedule.agents if a.group == group
-        ]
-        if include_bankrupt:
-            return firms
-        elif bankrupt_only:
-            return [f for f in firms if f.bankrupt]
-        return [f for f in firms if not f.bankrupt]
+        return self.schedule.get_group(group, include_bankrupt, bankrupt_only)
+
+    def sector(self, group, name):
+        """Aggregates ``name`` of ``sector_reductions`` over the live firms of
+        ``group``, computed when first read after the firms changed.
+        """
+        return self.cache.get(
+            f'{group}.{name}',
+            lambda: self.reductions[group][name].compute(self.get_group(group))
+        )
 
     def compute_average_price(self, group, weighted=False):
-        firms = self.get_group(group)
-        if not weighted:
-            prices = [firm.price for firm in firms]
-            return sum(prices) / len(prices)
-        return sum([firm.market_share * firm.price for firm in firms])
+        prices = self.sector(group, 'weighted_prices' if weighted else 'prices')
+        return prices['avg_price']
 
     def update_average_prices(self):
         cpi = self.compute_average_price('consumption_firm')
@@ -285,46 +396,68 @@ class ComplexEconomy(Model):
         self.avg_cap_price = self.compute_average_price('capital_firm')
 
     def update_avg_ulc(self):  # currently not used
-        capital_firms = self.get_group('capital_firm')
-        lpcs = [a.machine.compute_unit_labour_cost(self) for a in capital_firms]
-        self.average_unit_labour_cost = sum(lpcs) / len(lpcs)
+        prices = self.sector('capital_firm', 'prices')
+        self.average_unit_labour_cost = (
+            self.market_wage * prices['mean_reciprocal_lpc']
+        )
 
     def update_average_labour_productivity(self, weighted=True):
-        firms = self.get_group('capital_firm')
-        if weighted:
-            avg_labour_prod = sum([
-                firm.market_share * firm.machine.labour_productivity_coefficient
-                for firm in firms
-            ])
-        else:
-            avg_labour_prod = (
-                sum([f.machine.labour_productivity_coefficient for f in firms])
-                / len(firms)
-            )
+        productivity = self.sector(
+            'capital_firm', 'prices' if weighted else 'unweighted_productivity'
+        )
+        avg_labour_prod = productivity['avg_labour_prod']
         self.delta_productivity = (
             (avg_labour_prod - self.avg_labour_prod) / self.avg_labour_prod
         )
         self.avg_labour_prod = avg_labour_prod
 
     def compute_sector_competitiveness(self, group):
-        firms = self.get_group(group)
-        comp = sum([
-            f.competitiveness * f.market_share for f in firms
-        ])
+        comp = self.sector(group, 'prices')['competitiveness']
         return round(comp, 2)
 
     def update_sector_competitiveness(self):
         self.avg_comp_competitiveness = self.compute_sector_competitiveness('consumption_firm')
         self.avg_cap_competitiveness = self.compute_sector_competitiveness('capital_firm')
 
+    def select_suppliers(self):
+        # runs after the capital firms have set their machine prices
+        firms = self.get_group('consumption_firm')
+        self.offers = OfferTable(self.get_group('capital_firm'))
+        suppliers = self.offers.choose_suppliers(
+            self.streams, self.schedule.steps, [f.unique_id for f in firms],
+            [f.supplier for f in firms], self.n_brochures
+        )
+        for firm, supplier in zip(firms, suppliers.tolist()):
+            firm.supplier = supplier
+
+    def plan_replacements(self):
+        firms = self.get_group('consumption_firm')
+        # the payback rule runs on the float machine arrays in both backends
+        want_to_scrap, replacement = plan_replacements(
+            self.offers, firms, self.vintages.lpc, float(self.market_wage),
+            float(self.payback_period_parameter)
+        )
+        for firm, scrap, desired_ri in zip(
+            firms, want_to_scrap, replacement.tolist()
+        ):
+            firm.want_to_scrap = scrap
+            firm.desired_ri = self.number(desired_ri)
+
     def aggregate_investment(self):
+        investment = self.sector('consumption_firm', 'investment')
+        self.expansion_investment = investment['expansion_investment']
+        self.replacement_investment = investment['replacement_investment']
+
+    def collect_orders(self):
         firms = self.get_group('consumption_firm')
-        self.expansion_investment = sum([
-            f.expansion_investment for f in firms
-        ])
-        self.replacement_investment = sum([
-            f.replacement_investment for f in firms
-        ])
+        self.order_book = OrderBook(
+            self.offers, firms, [self.number(f.investment) for f in firms],
+            self.numeric.dtype
+        )
+        for supplier, orders in zip(
+            self.offers.firms, self.order_book.demand.tolist()
+        ):
+            supplier.orders = orders
 
     def update_labour_supply(self):
         self.labour_supply = (
@@ -332,14 +465,14 @@ class ComplexEconomy(Model):
         )
 
     def aggregate_labour_demand(self):
-        self.consumption_labour_demand = sum([
-            a.labour_demand for a in self.get_group('consumption_firm')
-        ])
+        self.consumption_labour_demand = (
+            self.sector('consumption_firm', 'labour')['labour_demand']
+        )
 
     def update_employment(self):
         self.employment = min(self.labour_demand, self.labour_supply)
         self.unemployment = max(0, self.labour_supply - self.employment)
-        unemployment_rate = d(self.unemployment / self.labour_supply)
+        unemployment_rate = self.unemployment / self.labour_supply
         delta_unemployment = unemployment_rate - self.unemployment_rate
         self.unemployment_rate = unemployment_rate
         self.delta_unemployment = delta_unemployment
@@ -366,43 +499,63 @@ class ComplexEconomy(Model):
         self.consumption = self.compute_consumption()
 
     def aggregate_production(self):
-        firms = self.get_group('consumption_firm')
-        self.agg_production = sum([
-            f.production for f in firms
-        ])
+        output = self.sector('consumption_firm', 'output')
+        self.agg_production = output['production']
 
     def aggregate_inventories(self):
-        firms = self.get_group('consumption_firm')
-        self.agg_inventories = sum([
-            f.inventory for f in firms
-        ])
+        output = self.sector('consumption_firm', 'output')
+        self.agg_inventories = output['inventory']
+
+    def record_tables(self):
+        # record before stage five replaces machines and innovates
+        for group in self.groups:
+            self.recorder.record(
+                group, self.get_group(group), self.schedule.steps
+            )
+
+    def settle_orders(self):
+        # after record_tables, so that the tables show the orders as placed
+        book = self.order_book
+        dtype = self.numeric.dtype
+        suppliers = self.offers.firms
+        buyers, expansion, replacement, reimbursement = book.settle(
+            np.array([f.output for f in suppliers], dtype=dtype),
+            np.array([f.price for f in suppliers], dtype=dtype),
+            np.array([f.expansion_investment for f in book.buyers], dtype=dtype)
+        )
+        for firm, ei, ri, amount in zip(
+            buyers, expansion.tolist(), replacement.tolist(),
+            reimbursement.tolist()
+        ):
+            firm.liquid_assets += amount
+            firm.expansion_investment = ei
+            firm.replacement_investment = ri
 
     def exit_and_entry(self):
         for group in self.groups:  # TODO: move setting bankrupt to firms
-            self.log.info(f'entry and exit for group {group}')
+            self.log.info('entry and exit for group %s', group)
             firms = self.get_group(group)
             dead_firms = [
                 f for f in firms
                 if f.market_share <= 0 or f.liquid_assets < 0
             ]
-            self.log.info(f'Bankrupt firms: {len(dead_firms)}')
-            alive_firms = [
-                f for f in firms if f not in dead_firms
-            ]
+            self.log.info('Bankrupt firms: %d', len(dead_firms))
+            for firm in dead_firms:
+                self.schedule.mark_bankrupt(firm)
+            alive_firms = self.get_group(group)
             for firm in dead_firms:
-                firm.bankrupt = True
-                copy_firm = self.random.choice(alive_firms)
-                next_id = max([a.unique_id for a in self.schedule.agents]) + 1
+                copy_firm = alive_firms[self.streams.integers(
+                    'entry', self.schedule.steps, firm.unique_id,
+                    len(alive_firms)
+                )]
+                next_id = self.next_id()
                 assets = copy_firm.liquid_assets
                 market_share = copy_firm.market_share
                 capital_stock = (
                     copy_firm.capital_stock if group == 'consumption_firm'
                     else None
                 )
-                constructor = {
-                    'consumption_firm': ConsumptionGoodFirm,
-                    'capital_firm': CapitalGoodFirm
-                }.get(group)
+                constructor = self.firm_classes[group]
                 new_firm = constructor(
                     int(next_id), self, assets,
                     market_share=market_share, capital_stock=capital_stock
@@ -413,8 +566,15 @@ class ComplexEconomy(Model):
                     )
                     new_firm.machine.price = copy_firm.machine.price
                 self.schedule.add(new_firm)
+            self._evict_bankrupt(group)
             self._calibrate_market_share(group)
 
+    def _evict_bankrupt(self, group):
+        # move exited firms out of the schedule so later steps skip them
+        for firm in self.get_group(group, bankrupt_only=True):
+            self.schedule.remove(firm)
+            self.archive.add(firm, self.schedule.steps)
+
     def _calibrate_market_share(self, group):
         # TODO: adjust market share after re-entry
         firms = self.get_group(group)
@@ -427,7 +587,27 @@ class ComplexEconomy(Model):
         pass
 
     def step(self):
+        profiler = self.profiler
+        self.numeric.activate()
         # run all stages of a step
         self.schedule.step()
         # collect data
+        if profiler is not None:
+            start = clock()
         self.datacollector.collect(self)
+        if profiler is not None:
+            profiler.record(
+                self.schedule.steps - 1, 'step', 'collect', 'model',
+                clock() - start
+            )
+        if self.checkpointer is not None:
+            self.checkpointer(self)
+        if self.sink is not None:
+            if profiler is not None:
+                start = clock()
+            self.sink(self)
+            if profiler is not None:
+                profiler.record(
+                    self.schedule.steps - 1, 'step', 'sink', 'model',
+                    clock() - start
+                )
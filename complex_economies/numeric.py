@@ -0,0 +1,73 @@
+"""Numeric backends for the model's state and accounting.
+
+The backend is chosen with ``ComplexEconomy(..., numeric=...)`` and converts
+every parameter, initial condition and value coming from outside the
+accounting (machine stocks, random draws) with ``number``. Both backends
+evaluate the same formulas, they only differ in the number type:
+
+* ``'float'``: Python floats. Nothing is rounded while the model runs; the
+  agent tables round real-valued columns to ``record_decimals`` (4 by
+  default) when they are recorded.
+* ``'decimal'``: ``decimal.Decimal`` arithmetic with a 28 digit context in
+  which mixing in floats raises ``FloatOperation``, for auditing the
+  accounting. Agent tables keep the ``Decimal`` values unrounded.
+
+With the decimal backend the per-firm and aggregate accounting (prices,
+wages, demand, production, sales, profits, liquid assets and debt) is
+computed in ``Decimal`` with 28 significant digits throughout. The machine
+ledger and the market choices made over arrays are not, they stay float64
+in both backends: the stock and labour productivity coefficient of every
+vintage, hence a firm's capital stock and average productivity
+(``MachineStock``), the payback rule choosing the machines to replace
+(``market.plan_replacements``) and the offer table used to pick suppliers.
+Their results enter the accounting through ``number``, i.e. as the
+``Decimal`` of the shortest repr of the float.
+"""
+from decimal import Context, Decimal, FloatOperation, setcontext
+
+import numpy as np
+
+
+class FloatBackend:
+
+    name = 'float'
+    # dtype of the real-valued agent table columns
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, record_decimals=4):
+        self.record_decimals = record_decimals
+
+    def number(self, value):
+        return float(value)
+
+    def activate(self):
+        pass
+
+
+class DecimalBackend:
+
+    name = 'decimal'
+    dtype = np.dtype(object)
+    record_decimals = None
+
+    def __init__(self, prec=28):
+        self.context = Context(prec=prec)
+        self.context.traps[FloatOperation] = True
+
+    def number(self, value):
+        if isinstance(value, Decimal):
+            return value
+        if isinstance(value, (int, np.integer)):
+            return Decimal(int(value))
+        # the shortest repr of a float, e.g. 0.1 and not its binary expansion
+        return Decimal(repr(float(value)))
+
+    def activate(self):
+        # the context is per thread, so it is set again before every step
+        setcontext(self.context)
+
+
+backends = {
+    'float': FloatBackend,
+    'decimal': DecimalBackend
+}
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+benchmark_parameters = {
+    'sample_size': 600,
+    'n_consumption_firms': 200,
+    'n_capital_firms': 50,
+    'replicator_dynamics_coeff': (-.5, -.5),
+    'competitiveness_weights': ((1, 1), (1, 1)),
+    'distribution_bounds': (-.5, .5),
+    'labour_supply_growth': .01,  # .01
+    'wage_setting': {
+        'cpi_weight': 0.75,  # .75
+        'avg_lp_weight': 1,
+        'unemployment_weight': .1  # .1
+    },
+    'desired_capital_utilization': .75,
+    'trigger_rule': .1,
+    'payback_period_parameter': 4,
+    'mark_up': .3,
+    'interest_rate': .01,
+    'wage_share': 0.1,  # .1 in first paper, .33 in second
+    'betas': [.7, .3, 0, 0, .25, 1, .05, .25],
+    'myopic': True,  # if False, demand is forecast from past demand with betas
+    'max_debt_sales_ratio': 1,  # this is not provided in the paper
+    # added by me
+    # 'innovation': False,
+    'social_policy': 'base',  # at the moment, 'base' and 'welfare' are possible
+    'inventory_deprecation': 0,
+    'fix_supplier': True,
+    'debug_machines': False,  # check running machine totals on every read
+    'n_brochures': 10,  # suppliers a consumption firm hears of per step
+}
+
+# default initial conditions, the keyword arguments of ComplexEconomy
+initial_conditions = {
+    'market_wage': 100,
+    'cpi': 1.3,
+    'avg_labour_productivity': 100,
+    'liquid_assets': 3000,
+    'capital_stock': 2000,
+    'labour_supply': 3000,
+    'innovation': True,
+}
@@ -0,0 +1,39 @@
+from time import perf_counter
+
+import pandas as pd
+
+
+clock = perf_counter
+
+
+class StageProfiler:
+    """Wall time, call counts and agents processed per part of a step.
+
+    Parts are keyed by ``(stage, name)`` where ``name`` is a group for an
+    agent stage pass, or the name of an interim function. Work done once per
+    step, like data collection, is recorded under the ``'step'`` stage.
+    """
+
+    columns = ['step', 'stage', 'name', 'kind', 'time', 'agents']
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, step, stage, name, kind, elapsed, agents=0):
+        self.records.append((step, stage, name, kind, elapsed, agents))
+
+    def time_series(self):
+        """One row per recorded call, in the order they ran."""
+        return pd.DataFrame(self.records, columns=self.columns)
+
+    def report(self):
+        """Totals per part of the step, slowest first."""
+        data = self.time_series()
+        report = data.groupby(['stage', 'name', 'kind']).agg(
+            time=('time', 'sum'),
+            calls=('time', 'size'),
+            agents=('agents', 'sum')
+        )
+        report['time_per_call'] = report['time'] / report['calls']
+        report['share'] = report['time'] / report['time'].sum()
+        return report.sort_values('time', ascending=False)
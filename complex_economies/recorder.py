@@ -0,0 +1,143 @@
+from operator import attrgetter
+
+import numpy as np
+import pandas as pd
+
+
+# value stored for fields a row does not provide
+missing_values = {
+    np.dtype(np.float64): np.nan,
+    np.dtype(np.int64): -1,
+    np.dtype(np.bool_): False,
+    np.dtype(object): None
+}
+
+
+class ColumnarTable:
+    """Table stored as typed NumPy columns that grow by doubling."""
+
+    def __init__(self, dtypes, capacity=1024):
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in dtypes.items()}
+        self.capacity = capacity
+        self.size = 0
+        self.buffers = {
+            name: np.empty(capacity, dtype=dtype)
+            for name, dtype in self.dtypes.items()
+        }
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, n_rows):
+        required = self.size + n_rows
+        if required <= self.capacity:
+            return None
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        for name, buffer in self.buffers.items():
+            grown = np.empty(capacity, dtype=buffer.dtype)
+            grown[:self.size] = buffer[:self.size]
+            self.buffers[name] = grown
+        self.capacity = capacity
+
+    def append(self, columns, n_rows):
+        """Append ``n_rows`` rows given as a dict of scalars or arrays.
+
+        Columns that are not given are filled with the missing value of
+        their dtype.
+        """
+        self.reserve(n_rows)
+        start, stop = self.size, self.size + n_rows
+        for name, buffer in self.buffers.items():
+            buffer[start:stop] = columns.get(
+                name, missing_values.get(self.dtypes[name])
+            )
+        self.size = stop
+
+    def clear(self):
+        """Drop all rows.
+
+        The next rows go to new buffers, so DataFrames returned by
+        ``to_dataframe`` before keep the rows they show.
+        """
+        self.size = 0
+        self.buffers = {
+            name: np.empty(self.capacity, dtype=dtype)
+            for name, dtype in self.dtypes.items()
+        }
+
+    def column(self, name):
+        return self.buffers[name][:self.size]
+
+    def to_dataframe(self):
+        # the frame wraps views of the buffers, so no data is copied
+        return pd.DataFrame(
+            {name: self.column(name) for name in self.buffers}, copy=False
+        )
+
+
+class TableRecorder:
+    """Records agent tables column-wise, one bulk append per group and step.
+
+    ``tables`` maps a table name to a dict of ``{column: (attribute, dtype)}``
+    where ``attribute`` is read from each agent with ``operator.attrgetter``.
+    The ``step`` column is filled in by ``record``.
+
+    ``float64`` columns are stored as ``real_dtype`` instead, e.g. ``object``
+    to keep ``Decimal`` values, and rounded to ``decimals`` if it is given.
+    """
+
+    def __init__(self, tables, capacity=1024, real_dtype=np.float64,
+                 decimals=None):
+        self.decimals = decimals
+        self.getters = {}
+        self.tables = {}
+        self.rounded = {}
+        for table, columns in tables.items():
+            self.getters[table] = {
+                name: attrgetter(attribute)
+                for name, (attribute, _) in columns.items()
+            }
+            dtypes = {'step': np.int64}
+            dtypes.update({
+                name: real_dtype if np.dtype(dtype) == np.float64 else dtype
+                for name, (_, dtype) in columns.items()
+            })
+            self.tables[table] = ColumnarTable(dtypes, capacity)
+            self.rounded[table] = [
+                name for name, (_, dtype) in columns.items()
+                if decimals is not None and np.dtype(dtype) == np.float64
+            ]
+
+    def record(self, table, agents, step):
+        buffer = self.tables[table]
+        columns = {'step': step}
+        for name, getter in self.getters[table].items():
+            dtype = buffer.dtypes[name]
+            missing = missing_values.get(dtype)
+            columns[name] = np.fromiter(
+                (
+                    missing if value is None else value
+                    for value in map(getter, agents)
+                ),
+                dtype=dtype, count=len(agents)
+            )
+        for name in self.rounded[table]:
+            np.round(columns[name], self.decimals, out=columns[name])
+        buffer.append(columns, len(agents))
+
+    def add_table_row(self, table, row):
+        """Append a single row, e.g. the initial state of a new firm."""
+        dtypes = self.tables[table].dtypes
+        columns = {
+            name: missing_values.get(dtypes[name]) if value is None else value
+            for name, value in row.items()
+        }
+        for name in self.rounded[table]:
+            if name in columns:
+                columns[name] = round(float(columns[name]), self.decimals)
+        self.tables[table].append(columns, 1)
+
+    def get_table_dataframe(self, table):
+        return self.tables[table].to_dataframe()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Sector aggregates computed in one pass over the firms of a group.
+
+A ``Reduction`` is declared with the aggregates one part of the step reads
+from a group, e.g. the interim functions after stage one from the capital
+firms::
+
+    Reduction({
+        'avg_price': ('mean', 'price'),
+        'avg_labour_prod': (
+            'weighted', 'machine.labour_productivity_coefficient',
+            'market_share'
+        )
+    })
+
+``compute`` makes one sweep over the firms: a single ``attrgetter`` reads
+every field the aggregates need from a firm at once, and the rows are
+transposed into one column per field, shared by all aggregates of the
+reduction. The aggregates are then evaluated with built-in reductions over
+those columns. The firm values are Python numbers (floats or ``Decimal``),
+and converting them to arrays costs more than the sums themselves. Sums run
+in firm order, as a loop over the firms would. The model caches the results
+until the group's firms change, see ``ComplexEconomy.sector``.
+"""
+from operator import attrgetter, mul
+
+
+def total(n, x):
+    return sum(x)
+
+
+def mean(n, x):
+    return sum(x) / n
+
+
+def weighted(n, x, weights):
+    """Sum of ``x`` weighted by ``weights``."""
+    return sum(map(mul, weights, x))
+
+
+def reciprocal_mean(n, x):
+    return sum([1 / v for v in x]) / n
+
+
+# aggregate kinds: {kind: function of the number of firms and the columns}
+kinds = {
+    'sum': total,
+    'mean': mean,
+    'weighted': weighted,
+    'reciprocal_mean': reciprocal_mean
+}
+
+
+class Reduction:
+    """Aggregates over firms, each ``{name: (kind, *fields)}``.
+
+    Fields are attribute names, or dotted paths such as
+    ``'machine.labour_productivity_coefficient'``.
+    """
+
+    def __init__(self, aggregates):
+        for name, (kind, *fields) in aggregates.items():
+            if kind not in kinds:
+                raise ValueError(
+                    f'unknown aggregate kind {kind!r} for {name!r}, use one '
+                    f'of {list(kinds)}'
+                )
+        self.aggregates = aggregates
+        self.fields = list(dict.fromkeys(
+            field for _, *fields in aggregates.values() for field in fields
+        ))
+        self._getter = attrgetter(*self.fields)
+        # {name: (reduction function, indices of its columns)}
+        self._reducers = {
+            name: (kinds[kind], [self.fields.index(f) for f in fields])
+            for name, (kind, *fields) in aggregates.items()
+        }
+
+    def compute(self, firms):
+        """Return ``{name: value}`` for all aggregates over the list ``firms``."""
+        if len(self.fields) == 1:
+            columns = [list(map(self._getter, firms))]
+        else:
+            columns = list(zip(*map(self._getter, firms)))
+            if not columns:
+                columns = [()] * len(self.fields)
+        n = len(firms)
+        return {
+            name: reduce(n, *[columns[i] for i in indices])
+            for name, (reduce, indices) in self._reducers.items()
+        }
@@ -1,39 +1,103 @@
 # -*- coding: utf-8 -*-
 from mesa.time import StagedActivation
 
+from complex_economies.profiling import clock
+
 
 class GroupedActivation(StagedActivation):
     def __init__(self, model, groups, stage_list=None, shuffle=False,
-                 shuffle_between_stages=False, interim_functions=None):
+                 shuffle_between_stages=False, interim_functions=None,
+                 cache=None, profiler=None,
+                 tracer=None):
         super().__init__(model, stage_list, shuffle, shuffle_between_stages)
         self.stage = 0
         self.groups = groups
         self.stage_functions = interim_functions
+        self.cache = cache
+        self.profiler = profiler
+        self.tracer = tracer
+        # per-group membership, kept up to date on add, remove and bankruptcy
+        self._groups = {group: {} for group in groups}
+        self._alive = {group: {} for group in groups}
+        self._bankrupt = {group: {} for group in groups}
+
+    def add(self, agent):
+        super().add(agent)
+        self._groups[agent.group][agent.unique_id] = agent
+        if agent.bankrupt:
+            self._bankrupt[agent.group][agent.unique_id] = agent
+        else:
+            self._alive[agent.group][agent.unique_id] = agent
+
+    def remove(self, agent):
+        super().remove(agent)
+        self._groups[agent.group].pop(agent.unique_id)
+        self._alive[agent.group].pop(agent.unique_id, None)
+        self._bankrupt[agent.group].pop(agent.unique_id, None)
+
+    def mark_bankrupt(self, agent):
+        agent.bankrupt = True
+        self._alive[agent.group].pop(agent.unique_id, None)
+        self._bankrupt[agent.group][agent.unique_id] = agent
+
+    def _invalidate(self, event):
+        if self.cache is not None:
+            self.cache.invalidate(event)
 
     def get_agent(self, unique_id, _raise=True):
         if _raise:
             return self._agents[unique_id]
         return self._agents.get(unique_id, None)
 
+    def get_group(self, group, include_bankrupt=False, bankrupt_only=False):
+        if include_bankrupt and bankrupt_only:
+            raise ValueError('include_bankrupt and bankrupt_only are mutually exclusive')
+        if include_bankrupt:
+            return list(self._groups[group].values())
+        elif bankrupt_only:
+            return list(self._bankrupt[group].values())
+        return list(self._alive[group].values())
+
     def step(self):
+        profiler = self.profiler
+        tracer = self.tracer
         # we want each group to do each of their stages in order, so the outer loop is stages
         for stage in self.stage_list:
             self.stage += 1
             for group in self.groups:
+                if profiler is not None:
+                    start = clock()
                 # get all agents of group
-                agent_keys = [uid for uid, a in self._agents.items() if a.group == group]
+                agent_keys = list(self._groups[group])
                 if self.shuffle:
                     self.model.random.shuffle(agent_keys)
+                self._invalidate((group, stage))
                 # run stage for each agent in group
                 for agent_key in agent_keys:
                     getattr(self._agents[agent_key], stage)()
+                self._invalidate((group, stage))
                 if self.shuffle_between_stages:
                     self.model.random.shuffle(agent_keys)
                 self.time += self.stage_time
+                if profiler is not None:
+                    profiler.record(
+                        self.steps, stage, group, 'agents', clock() - start,
+                        len(agent_keys)
+                    )
+                if tracer is not None:
+                    tracer.trace(self.steps, group, stage, self._alive[group])
             # finally, run any model level functions for that stage
             if self.stage_functions and stage in self.stage_functions:
                 for func in self.stage_functions[stage]:
+                    if profiler is not None:
+                        start = clock()
+                    self._invalidate(func)
                     getattr(self.model, func)()
+                    self._invalidate(func)
+                    if profiler is not None:
+                        profiler.record(
+                            self.steps, stage, func, 'model', clock() - start
+                        )
             self.time += self.stage_time
 
         self.steps += 1
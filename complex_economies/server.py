@@ -4,6 +4,8 @@ from mesa.visualization.modules import ChartModule
 from mesa.visualization.UserParam import UserSettableParameter
 # from complex_economies.agents import CapitalGoodFirm, ConsumptionGoodFirm
 from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import benchmark_parameters, initial_conditions
+from complex_economies.visualization import BackgroundServer, StreamingChartModule
 
 
 # Green
@@ -17,62 +19,36 @@ investment_colour = "#00FFFF"
 # Pink
 inventories_colour = "#FF00D3"
 
-benchmark_parameters = {
-    'sample_size': 600,
-    'n_consumption_firms': 200,
-    'n_capital_firms': 50,
-    'replicator_dynamics_coeff': (-.5, -.5),
-    'competitiveness_weights': ((1, 1), (1, 1)),
-    'distribution_bounds': (-.5, .5),
-    'labour_supply_growth': .01,  # .01
-    'wage_setting': {
-        'cpi_weight': 0.75,  # .75
-        'avg_lp_weight': 1,
-        'unemployment_weight': .1  # .1
-    },
-    'desired_capital_utilization': .75,
-    'trigger_rule': .1,
-    'payback_period_parameter': 4,
-    'mark_up': .3,
-    'interest_rate': .01,
-    'wage_share': 0.1,  # .1 in first paper, .33 in second
-    'betas': [.7, .3, 0, 0, .25, 1, .05, .25],
-    'max_debt_sales_ratio': 1,  # this is not provided in the paper
-    # added by me
-    # 'innovation': False,
-    'social_policy': 'base',  # at the moment, 'base' and 'welfare' are possible
-    'inventory_deprecation': 0,
-    'fix_supplier': True,
-}
-
 # dictionary of user settable parameters - these map to the model __init__ parameters
 init_conditions = {
     "market_wage": UserSettableParameter(
-        "slider", name="Market Wage", value=100, min_value=1, max_value=200,
+        "slider", name="Market Wage", value=initial_conditions['market_wage'],
+        min_value=1, max_value=200,
         description="Initial market wage"
     ),
     "cpi": UserSettableParameter(
-        "number", "Consumer Price Index", 1.3, 1, 2,
+        "number", "Consumer Price Index", initial_conditions['cpi'], 1, 2,
         description="Initial cpi level"
     ),
     "avg_labour_productivity": UserSettableParameter(
-        "slider", "Average Labour Productivity", 100, 1, 200,
+        "slider", "Average Labour Productivity",
+        initial_conditions['avg_labour_productivity'], 1, 200,
         description="Initial average labour productivity"
     ),
     "liquid_assets": UserSettableParameter(
-        "slider", "Liquid Assets", 3000, 100, 10000,
+        "slider", "Liquid Assets", initial_conditions['liquid_assets'], 100, 10000,
         description="Initial liquid assets of each firm"
     ),
     "capital_stock": UserSettableParameter(
-        "slider", "Capital Stock", 2000, 100, 10000,
+        "slider", "Capital Stock", initial_conditions['capital_stock'], 100, 10000,
         description="Initial capital stock of consumption firms"
     ),
     "labour_supply": UserSettableParameter(
-        "slider", "Labour Supply", 3000, 100, 10000,
+        "slider", "Labour Supply", initial_conditions['labour_supply'], 100, 10000,
         description="Initial labour supply in the economy"
     ),
     'innovation': UserSettableParameter(
-        "checkbox", name="Innovation", value=True,
+        "checkbox", name="Innovation", value=initial_conditions['innovation'],
         description="Whether there is innovation or not"
     ),
 }
@@ -83,31 +59,47 @@ model_params = {
     "seed": 123456
 }
 
-# map data to chart in the ChartModule
-chart_1 = ChartModule([
+# series shown in each chart
+series_1 = [
     {"Label": "gdp", "Color": gdp_colour},
     {"Label": "consumption", "Color": consumption_colour},
     {"Label": "production", "Color": production_colour},
     {"Label": "investment", "Color": investment_colour},
     {"Label": "inventories", "Color": inventories_colour}
-])
+]
 
-chart_2 = ChartModule([
+series_2 = [
     {"Label": "labour_supply", "Color": gdp_colour},
     {"Label": "labour_demand", "Color": consumption_colour},
     {"Label": "employment", "Color": production_colour},
     {"Label": "unemployment", "Color": investment_colour}
-])
+]
 
-chart_3 = ChartModule([
+series_3 = [
     {"Label": "avg_comp_competitiveness", "Color": gdp_colour},
     {"Label": "avg_cap_competitiveness", "Color": consumption_colour},
     {"Label": "market_wage", "Color": production_colour}
-])
+]
 
 # create instance of Mesa ModularServer
 server = ModularServer(
-    ComplexEconomy, [chart_1, chart_2, chart_3],
+    ComplexEconomy,
+    [ChartModule(series_1), ChartModule(series_2), ChartModule(series_3)],
     "Complex Economy Model",
     model_params=model_params
 )
+
+
+# the same charts, with the model running ahead in a background thread; built
+# on demand, since a ModularServer creates its model when constructed
+def make_background_server():
+    return BackgroundServer(
+        ComplexEconomy,
+        [
+            StreamingChartModule(series_1),
+            StreamingChartModule(series_2),
+            StreamingChartModule(series_3)
+        ],
+        "Complex Economy Model",
+        model_params=model_params
+    )
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""Stream the data collected during a run to disk while the model runs.
+
+A ``StreamingSink`` takes the model reporters and the agent table rows of
+each step, batches them into row groups of ``row_group_steps`` steps and
+writes them from a background thread, one file per table::
+
+    with StreamingSink('run', format='parquet') as sink:
+        model.sink = sink
+        for _ in range(steps):
+            model.step()
+
+gives ``run/model.parquet``, ``run/consumption_firm.parquet`` and
+``run/capital_firm.parquet``. The queue to the writer thread holds at most
+``max_queue`` row groups, so a slow disk blocks the model instead of filling
+up memory. Unless ``keep`` is set, the rows handed to the sink are dropped
+from ``model.datacollector`` and ``model.recorder``, which keeps the memory
+of a long run flat; the DataFrames of the model then only hold the rows not
+yet handed over.
+
+Parquet and Arrow IPC (``format='arrow'``) need pyarrow, ``'csv'`` only
+pandas. ``Decimal`` values are written as strings, so they stay exact.
+"""
+import os
+from queue import Queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+
+formats = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+def arrow_column(values):
+    if values.dtype == object:
+        return pa.array(
+            [None if v is None else str(v) for v in values.tolist()],
+            type=pa.string()
+        )
+    return pa.array(values)
+
+
+class _ArrowFile:
+    """Parquet or Arrow IPC file, opened with the schema of the first batch."""
+
+    def __init__(self, path, open_writer):
+        self.path = path
+        self.open_writer = open_writer
+        self.writer = None
+
+    def write(self, columns):
+        table = pa.table(
+            {name: arrow_column(values) for name, values in columns.items()}
+        )
+        if self.writer is None:
+            self.writer = self.open_writer(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _CSVFile:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.header = True
+
+    def write(self, columns):
+        pd.DataFrame(columns, copy=False).to_csv(
+            self.file, header=self.header, index=False
+        )
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+def open_file(path, format):
+    if format == 'parquet':
+        return _ArrowFile(path, pa.parquet.ParquetWriter)
+    if format == 'arrow':
+        return _ArrowFile(path, pa.ipc.new_file)
+    return _CSVFile(path)
+
+
+class StreamingSink:
+    """Writes the collected data of every step to ``path`` in the background.
+
+    Assign an instance to ``model.sink`` and call ``close`` (or use it as a
+    context manager) after the last step to write the remaining rows. An
+    error in the writer thread is raised on the next step or on ``close``.
+    """
+
+    def __init__(self, path, format='parquet', row_group_steps=50,
+                 max_queue=4, keep=False):
+        if format not in formats:
+            raise ValueError(
+                f'unknown format {format!r}, use one of {list(formats)}'
+            )
+        if format != 'csv' and pa is None:
+            raise ImportError(
+                f"the {format} format needs pyarrow, install it or use "
+                f"format='csv'"
+            )
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.format = format
+        self.row_group_steps = row_group_steps
+        self.keep = keep
+        # rows of each table already handed over when they are kept
+        self._taken = {}
+        self._chunks = {}
+        self._pending = 0
+        self._error = None
+        self._closed = False
+        self._queue = Queue(max_queue)
+        self._thread = threading.Thread(
+            target=self._write, name='streaming-sink', daemon=True
+        )
+        self._thread.start()
+
+    def __call__(self, model):
+        self._raise_error()
+        self._take_model_vars(model)
+        for table, columns in model.recorder.tables.items():
+            self._take_table(table, columns)
+        self._pending += 1
+        if self._pending >= self.row_group_steps:
+            self.flush()
+
+    def _add(self, table, columns):
+        self._chunks.setdefault(table, []).append(columns)
+
+    def _take_model_vars(self, model):
+        model_vars = model.datacollector.model_vars
+        start = self._taken.get('model', 0)
+        n_rows = len(next(iter(model_vars.values()))) - start
+        if n_rows <= 0:
+            return
+        # the last row was collected after the current step
+        step = model.schedule.steps
+        columns = {'step': np.arange(step - n_rows + 1, step + 1)}
+        dtype = model.numeric.dtype
+        for name, values in model_vars.items():
+            columns[name] = np.array(values[start:], dtype=dtype)
+            if not self.keep:
+                del values[:]
+        self._add('model', columns)
+        if self.keep:
+            self._taken['model'] = start + n_rows
+
+    def _take_table(self, table, columns):
+        start = self._taken.get(table, 0)
+        if len(columns) <= start:
+            return
+        # views, rows are never overwritten: clear() starts new buffers
+        self._add(table, {
+            name: columns.column(name)[start:] for name in columns.buffers
+        })
+        if self.keep:
+            self._taken[table] = len(columns)
+        else:
+            columns.clear()
+
+    def flush(self):
+        """Queue the rows taken so far as one row group per table."""
+        if self._chunks:
+            self._queue.put(self._chunks)
+        self._chunks = {}
+        self._pending = 0
+
+    def _write(self):
+        files = {}
+        try:
+            while True:
+                chunks = self._queue.get()
+                if chunks is None:
+                    break
+                if self._error is not None:
+                    # keep draining, so that the model is never blocked
+                    continue
+                try:
+                    for table, parts in chunks.items():
+                        if table not in files:
+                            files[table] = open_file(
+                                os.path.join(
+                                    self.path, table + formats[self.format]
+                                ),
+                                self.format
+                            )
+                        files[table].write({
+                            name: np.concatenate([p[name] for p in parts])
+                            for name in parts[0]
+                        })
+                except Exception as error:
+                    self._error = error
+        finally:
+            for f in files.values():
+                try:
+                    f.close()
+                except Exception as error:
+                    self._error = self._error or error
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(
+                f'writing to {self.path} failed'
+            ) from self._error
+
+    def close(self):
+        """Write the remaining rows and wait for the writer to finish."""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,59 @@
+var StreamingChartModule = function(series, canvas_width, canvas_height) {
+    // Create the tag:
+    var canvas_tag = "<canvas width='" + canvas_width + "' height='" + canvas_height + "' ";
+    canvas_tag += "style='border:1px dotted'></canvas>";
+    // Append it to #elements
+    var canvas = $(canvas_tag)[0];
+    $("#elements").append(canvas);
+    var context = canvas.getContext("2d");
+
+    // points are [step, value] pairs, so series can be downsampled independently
+    var datasets = series.map(function(s) {
+        return {
+            label: s.Label,
+            borderColor: s.Color,
+            backgroundColor: s.Color,
+            fill: false,
+            pointRadius: 0,
+            lineTension: 0,
+            data: []
+        };
+    });
+
+    var chart = new Chart(context, {
+        type: 'line',
+        data: {datasets: datasets},
+        options: {
+            responsive: true,
+            animation: false,
+            tooltips: {mode: 'nearest', intersect: false},
+            scales: {
+                xAxes: [{type: 'linear', display: true, ticks: {maxTicksLimit: 11}}],
+                yAxes: [{display: true}]
+            }
+        }
+    });
+
+    var toPoint = function(p) {
+        return {x: p[0], y: p[1]};
+    };
+
+    this.render = function(data) {
+        for (var i = 0; i < data.series.length; i++) {
+            var points = data.series[i].map(toPoint);
+            if (data.reset) {
+                chart.data.datasets[i].data = points;
+            } else {
+                Array.prototype.push.apply(chart.data.datasets[i].data, points);
+            }
+        }
+        chart.update();
+    };
+
+    this.reset = function() {
+        chart.data.datasets.forEach(function(dataset) {
+            dataset.data = [];
+        });
+        chart.update();
+    };
+};
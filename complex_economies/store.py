@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Results of many runs in memory-mapped columns.
+
+A store is a directory with one raw binary file per table and column, e.g.
+``consumption_firm/liquid_assets.bin``, and a JSON header ``store.json``
+with the dtype of every column and the rows of every run. The rows of a run
+are contiguous and sorted by step, within a step in the order they were
+recorded. Every table has ``run_id`` and ``step`` columns, the agent tables
+also ``agent_id``; the initial rows of firms that entered during the run
+have step -1 and come first.
+
+``ResultStore`` maps the files instead of reading them, so opening a store
+of any size is instant and a slice only reads the pages it touches::
+
+    store = ResultStore('sweep')
+    liquid_assets = store.column('consumption_firm', 'liquid_assets')
+    run = store.frame('consumption_firm', run_id=3, columns=['profit'])
+    firm = store.select('consumption_firm', 'profit', run_id=3, agent_id=60)
+
+``StoreWriter`` appends runs, as ``complex_economies.batch`` does with
+``--store``. Columns must have a fixed size dtype, so runs with the decimal
+backend cannot be stored.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+FORMAT_VERSION = 1
+
+header_name = 'store.json'
+
+
+class StoreWriter:
+    """Appends the tables of finished runs to the store at ``path``.
+
+    The dtypes of a table are fixed by its first run; columns of later runs
+    are cast to them if that is safe (e.g. int to float) and rejected
+    otherwise. The header is rewritten after every run, so the store can be
+    read while the sweep is still running.
+    """
+
+    def __init__(self, path):
+        if os.path.exists(os.path.join(path, header_name)):
+            raise FileExistsError(f'{path} already holds a result store')
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.tables = {}
+
+    def add(self, run_id, table, columns):
+        """Append the rows of run ``run_id`` to ``table``.
+
+        ``columns`` is a DataFrame or a dict of equally long arrays; a
+        ``run_id`` column in it is ignored.
+        """
+        if isinstance(columns, pd.DataFrame):
+            columns = {name: columns[name].to_numpy() for name in columns}
+        columns = {
+            name: np.asarray(values) for name, values in columns.items()
+            if name != 'run_id'
+        }
+        n_rows = len(next(iter(columns.values())))
+        columns = {'run_id': np.full(n_rows, run_id, dtype=np.int64), **columns}
+
+        info = self.tables.get(table)
+        if info is None:
+            for name, values in columns.items():
+                if values.dtype.hasobject:
+                    raise TypeError(
+                        f'column {name!r} of {table!r} holds Python objects '
+                        f'and cannot be stored'
+                    )
+            info = self.tables[table] = {
+                'dtypes': {
+                    name: values.dtype.str for name, values in columns.items()
+                },
+                'runs': [],
+                'offsets': [0]
+            }
+            os.makedirs(os.path.join(self.path, table), exist_ok=True)
+        dtypes = info['dtypes']
+        if set(columns) != set(dtypes):
+            raise ValueError(
+                f'run {run_id} has columns {sorted(columns)} for {table!r}, '
+                f'expected {sorted(dtypes)}'
+            )
+        if run_id in info['runs']:
+            raise ValueError(f'run {run_id} is already stored in {table!r}')
+        steps = columns['step']
+        if (np.diff(steps) < 0).any():
+            order = np.argsort(steps, kind='stable')
+            columns = {name: values[order] for name, values in columns.items()}
+
+        for name, dtype in dtypes.items():
+            values = columns[name].astype(dtype, casting='same_kind', copy=False)
+            with open(column_path(self.path, table, name), 'ab') as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+        info['runs'].append(run_id)
+        info['offsets'].append(info['offsets'][-1] + n_rows)
+        self._write_header()
+
+    def _write_header(self):
+        header = {'version': FORMAT_VERSION, 'tables': self.tables}
+        temporary = os.path.join(self.path, header_name + '.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(header, f)
+        os.replace(temporary, os.path.join(self.path, header_name))
+
+
+def column_path(path, table, name):
+    return os.path.join(path, table, f'{name}.bin')
+
+
+class ResultStore:
+    """Read-only view of the store at ``path``.
+
+    Arrays returned for a single run or for all runs are views of the mapped
+    files and are not copied; ``runs`` with several runs concatenates them.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, header_name)) as f:
+            header = json.load(f)
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f'unsupported store version {header["version"]}')
+        self.path = path
+        self.tables = header['tables']
+        self._maps = {}
+        self._rows = {
+            table: {
+                run_id: (start, stop) for run_id, start, stop in zip(
+                    info['runs'], info['offsets'][:-1], info['offsets'][1:]
+                )
+            }
+            for table, info in self.tables.items()
+        }
+
+    def runs(self, table):
+        """Run ids of ``table`` in storage order."""
+        return list(self.tables[table]['runs'])
+
+    def columns(self, table):
+        return list(self.tables[table]['dtypes'])
+
+    def _map(self, table, name):
+        key = (table, name)
+        if key not in self._maps:
+            info = self.tables[table]
+            dtype = np.dtype(info['dtypes'][name])
+            n_rows = info['offsets'][-1]
+            if n_rows == 0:
+                self._maps[key] = np.empty(0, dtype=dtype)
+            else:
+                self._maps[key] = np.memmap(
+                    column_path(self.path, table, name), dtype=dtype,
+                    mode='r', shape=(n_rows,)
+                )
+        return self._maps[key]
+
+    def column(self, table, name, runs=None):
+        """Column ``name`` of ``table`` over all runs or the given ``runs``."""
+        values = self._map(table, name)
+        if runs is None:
+            return values
+        if np.ndim(runs) == 0:
+            runs = [runs]
+        parts = [values[slice(*self._rows[table][run_id])] for run_id in runs]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _run_rows(self, table, run_id, step):
+        start, stop = self._rows[table][run_id]
+        if step is None:
+            return start, stop
+        # the rows of a run are sorted by step
+        steps = self._map(table, 'step')[start:stop]
+        return (
+            start + np.searchsorted(steps, step, 'left'),
+            start + np.searchsorted(steps, step, 'right')
+        )
+
+    def select(self, table, name, run_id, step=None, agent_id=None):
+        """Values of ``name`` for one run, optionally for one step and firm."""
+        start, stop = self._run_rows(table, run_id, step)
+        values = self._map(table, name)[start:stop]
+        if agent_id is None:
+            return values
+        return values[self._map(table, 'agent_id')[start:stop] == agent_id]
+
+    def frame(self, table, run_id, columns=None, step=None):
+        """DataFrame of one run (and step) wrapping the mapped columns."""
+        start, stop = self._run_rows(table, run_id, step)
+        return pd.DataFrame(
+            {
+                name: self._map(table, name)[start:stop]
+                for name in columns or self.columns(table)
+            },
+            copy=False
+        )
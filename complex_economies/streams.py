@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Random numbers that depend only on the seed, the step and the firm.
+
+Each random decision of the model draws from its own stream: ``'supplier'``
+for the brochures a consumption firm receives, ``'innovation'`` for the
+research outcome of a capital firm and ``'entry'`` for the firm an entrant
+copies. The key of every stream is spawned from the model seed with
+``numpy.random.SeedSequence``. A draw is a hash of the key and a counter made
+of the step, the firm's ``unique_id`` and the index of the draw, so it
+does not depend on the order in which firms are processed, on how many
+other draws were made before it, or on whether it is computed for one firm
+or for all firms at once, so a seed gives the same run however the firms
+are scheduled.
+
+The hash is the SplitMix64 finalizer applied after adding each counter.
+``uniform`` and ``integers`` work on Python ints for a single firm and on
+arrays for many, with the same results.
+"""
+import numpy as np
+
+
+purposes = ['supplier', 'innovation', 'entry']
+
+MASK = 2 ** 64 - 1
+GOLDEN = 0x9E3779B97F4A7C15
+M1 = 0xBF58476D1CE4E5B9
+M2 = 0x94D049BB133111EB
+
+
+def mix(x):
+    """SplitMix64 finalizer of a Python int or a ``uint64`` array."""
+    x = (x ^ (x >> 30)) * M1 & MASK
+    x = (x ^ (x >> 27)) * M2 & MASK
+    return x ^ (x >> 31)
+
+
+def add_counter(x, counter):
+    """Hash of ``x`` with ``counter`` added, wrapping at 64 bits."""
+    if isinstance(counter, int):
+        counter = counter * GOLDEN & MASK
+    else:
+        counter = np.asarray(counter).astype(np.uint64) * np.uint64(GOLDEN)
+    return mix((x + counter) & MASK)
+
+
+class RandomStreams:
+    """Counter-based random streams, one per purpose, derived from ``seed``.
+
+    ``seed`` is an int or ``None`` for fresh entropy; ``entropy`` is the
+    value to pass to recreate the same streams.
+    """
+
+    def __init__(self, seed=None):
+        sequence = np.random.SeedSequence(seed)
+        self.entropy = sequence.entropy
+        self.keys = {
+            purpose: int(child.generate_state(1, np.uint64)[0])
+            for purpose, child in zip(purposes, sequence.spawn(len(purposes)))
+        }
+
+    def bits(self, purpose, step, agent, draw=0):
+        """64 random bits for each ``agent`` and ``draw``, which are ints or
+        arrays that broadcast against each other."""
+        if purpose not in self.keys:
+            raise ValueError(
+                f'unknown random stream {purpose!r}, use one of {purposes}'
+            )
+        x = add_counter(self.keys[purpose], step)
+        x = add_counter(x, agent)
+        return add_counter(x, draw)
+
+    def uniform(self, purpose, step, agent, draw=0, low=0.0, high=1.0):
+        """Uniform floats in ``[low, high)`` with 53 random bits."""
+        u = (self.bits(purpose, step, agent, draw) >> 11) * 2.0 ** -53
+        return low + (high - low) * u
+
+    def integers(self, purpose, step, agent, high, draw=0):
+        """Integers in ``[0, high)``."""
+        u = self.uniform(purpose, step, agent, draw)
+        if isinstance(u, float):
+            return int(u * high)
+        return (u * high).astype(np.int64)
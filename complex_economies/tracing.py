@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Structured tracing of selected agents.
+
+A ``Tracer`` writes one JSON object per line for every watched agent after
+every watched stage pass, e.g.::
+
+    tracer = Tracer('trace.jsonl', agents=[50], stages=['stage_four'],
+                    fields=['market_share', 'demand', 'liquid_assets'])
+    model = ComplexEconomy(parameters, tracer=tracer, **initial_conditions)
+
+gives lines like ``{"step":3,"stage":"stage_four","group":"consumption_firm",
+"id":50,"market_share":0.005,"demand":...}``. Without a tracer the scheduler
+skips tracing with a single check per stage pass.
+"""
+from operator import attrgetter
+import json
+
+import numpy as np
+
+
+def to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, tuple):
+        return list(value)
+    return str(value)
+
+
+class Tracer:
+    """Writes fields of watched agents after watched stages as JSON lines.
+
+    ``agents``, ``groups`` and ``stages`` select what is traced, ``None``
+    meaning all of them. ``fields`` are attribute names, dotted names like
+    ``machine.generation`` are allowed and fields an agent lacks are written
+    as ``null``; by default the agent's table columns are traced. Values JSON
+    has no type for, like ``Decimal``, are written as strings. ``output`` is
+    a path or an open text file.
+    """
+
+    def __init__(self, output, agents=None, stages=None, fields=None,
+                 groups=None):
+        if isinstance(output, str):
+            self.file = open(output, 'w')
+            self._owns_file = True
+        else:
+            self.file = output
+            self._owns_file = False
+        self.agents = None if agents is None else list(agents)
+        self.stages = None if stages is None else set(stages)
+        self.groups = None if groups is None else set(groups)
+        self.fields = None if fields is None else list(fields)
+        self._getters = {}
+        self.encoder = json.JSONEncoder(separators=(',', ':'), default=to_json)
+
+    def watches(self, group, stage):
+        return (
+            (self.stages is None or stage in self.stages)
+            and (self.groups is None or group in self.groups)
+        )
+
+    def getters(self, agent):
+        cls = type(agent)
+        if cls not in self._getters:
+            fields = self.fields
+            if fields is None:
+                # the unique id is already written as "id"
+                fields = [
+                    attribute for attribute, _ in agent.table_columns.values()
+                    if attribute != 'unique_id'
+                ]
+            self._getters[cls] = [
+                (field, attrgetter(field)) for field in fields
+            ]
+        return self._getters[cls]
+
+    def trace(self, step, group, stage, agents):
+        """Write the watched agents among ``agents``, a dict by unique id."""
+        if not self.watches(group, stage):
+            return None
+        if self.agents is None:
+            watched = agents.values()
+        else:
+            watched = [agents[i] for i in self.agents if i in agents]
+        for agent in watched:
+            record = {
+                'step': step, 'stage': stage, 'group': group,
+                'id': agent.unique_id
+            }
+            for field, getter in self.getters(agent):
+                try:
+                    record[field] = getter(agent)
+                except AttributeError:
+                    # the field belongs to another group
+                    record[field] = None
+            self.file.write(self.encoder.encode(record))
+            self.file.write('\n')
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
@@ -0,0 +1,50 @@
+from collections import Counter, defaultdict
+
+
+class StageCache:
+    """Cache for derived model quantities.
+
+    ``dependencies`` maps each quantity to the events that change its inputs.
+    An event is either a ``(group, stage)`` pair for an agent stage or the name
+    of a model interim function. A cached value is kept until one of its
+    events runs, so a quantity read by every firm in a stage is computed once.
+    """
+
+    def __init__(self, dependencies):
+        self.dependencies = dependencies
+        self.invalidated_by = defaultdict(set)
+        for name, events in dependencies.items():
+            for event in events:
+                self.invalidated_by[event].add(name)
+        self.hits = Counter()
+        self.misses = Counter()
+        self._values = {}
+
+    def get(self, name, compute):
+        try:
+            value = self._values[name]
+        except KeyError:
+            self.misses[name] += 1
+            value = self._values[name] = compute()
+            return value
+        self.hits[name] += 1
+        return value
+
+    def invalidate(self, event):
+        for name in self.invalidated_by.get(event, ()):
+            self._values.pop(name, None)
+
+    def clear(self):
+        self._values.clear()
+
+    def stats(self):
+        stats = {}
+        for name in self.dependencies:
+            hits, misses = self.hits[name], self.misses[name]
+            calls = hits + misses
+            stats[name] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / calls if calls else 0.
+            }
+        return stats
@@ -0,0 +1,173 @@
+import math
+
+import numpy as np
+
+
+class VintageRegistry:
+    """Interned, immutable machine vintages shared by all firms.
+
+    A vintage is identified by ``(producer, generation)`` and gets an integer
+    id the first time it is seen. Its labour productivity coefficient is
+    stored once in ``lpc``, indexed by vintage id.
+
+    With ``debug`` set, every firm's running stock totals are checked against
+    a full recompute whenever they are read.
+    """
+
+    def __init__(self, capacity=256, debug=False):
+        self.debug = debug
+        self._ids = {}
+        self.size = 0
+        self.producer = np.empty(capacity, dtype=np.int64)
+        self.generation = np.empty(capacity, dtype=np.int64)
+        self._lpc = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def lpc(self):
+        return self._lpc[:self.size]
+
+    def intern(self, machine):
+        key = (machine.producer, machine.generation)
+        try:
+            return self._ids[key]
+        except KeyError:
+            pass
+        vintage = self.size
+        if vintage == len(self._lpc):
+            capacity = 2 * len(self._lpc)
+            self.producer = np.resize(self.producer, capacity)
+            self.generation = np.resize(self.generation, capacity)
+            self._lpc = np.resize(self._lpc, capacity)
+        self.producer[vintage] = machine.producer
+        self.generation[vintage] = machine.generation
+        self._lpc[vintage] = machine.labour_productivity_coefficient
+        self._ids[key] = vintage
+        self.size += 1
+        return vintage
+
+    def load(self, producer, generation, lpc):
+        """Replace the registry with the given vintage arrays."""
+        self.size = len(lpc)
+        capacity = max(len(self._lpc), self.size)
+        self.producer = np.resize(np.asarray(producer, dtype=np.int64), capacity)
+        self.generation = np.resize(np.asarray(generation, dtype=np.int64), capacity)
+        self._lpc = np.resize(np.asarray(lpc, dtype=np.float64), capacity)
+        keys = zip(self.producer[:self.size].tolist(), self.generation[:self.size].tolist())
+        self._ids = {key: vintage for vintage, key in enumerate(keys)}
+
+    def key(self, vintage):
+        return int(self.producer[vintage]), int(self.generation[vintage])
+
+
+class MachineStock:
+    """Machines held by one firm, as vintage ids and the stock of each.
+
+    Vintages keep the order in which they were acquired. The total stock and
+    the sum of stock times labour productivity coefficient are kept as
+    running sums, updated as machines are added and scrapped, and re-synced
+    from the arrays whenever scrapping drops vintages. Stocks are floats
+    whatever the model's numeric backend.
+    """
+
+    __slots__ = ('registry', 'vintages', 'stock', '_total', '_productivity')
+
+    def __init__(self, registry, vintages=(), stock=()):
+        self.registry = registry
+        self.vintages = np.array(vintages, dtype=np.int64)
+        self.stock = np.array(stock, dtype=np.float64)
+        self.sync()
+
+    def __len__(self):
+        return len(self.vintages)
+
+    def rows(self, vintages):
+        """Row of each of ``vintages``, which the firm must hold."""
+        rows = dict(zip(self.vintages.tolist(), range(len(self.vintages))))
+        return np.fromiter(
+            (rows[v] for v in vintages), dtype=np.int64, count=len(vintages)
+        )
+
+    def get(self, vintages):
+        """Stock of each of ``vintages``."""
+        return self.stock[self.rows(vintages)]
+
+    def in_use(self):
+        """Vintages with a positive stock."""
+        return self.vintages[self.stock > 0]
+
+    def lpc(self):
+        return self.registry.lpc[self.vintages]
+
+    def total(self):
+        if self.registry.debug:
+            self.check()
+        return self._total
+
+    def productivity(self):
+        """Sum of stock times labour productivity coefficient."""
+        if self.registry.debug:
+            self.check()
+        return self._productivity
+
+    def sync(self):
+        """Recompute the running sums from the arrays."""
+        self._total = float(self.stock.sum())
+        self._productivity = float(np.dot(self.stock, self.lpc()))
+
+    def check(self):
+        total = float(self.stock.sum())
+        productivity = float(np.dot(self.stock, self.lpc()))
+        if not math.isclose(self._total, total, abs_tol=1e-6):
+            raise AssertionError(
+                f'running capital stock {self._total} != {total}'
+            )
+        if not math.isclose(
+            self._productivity, productivity, rel_tol=1e-9, abs_tol=1e-6
+        ):
+            raise AssertionError(
+                f'running productivity {self._productivity} != {productivity}'
+            )
+
+    def add(self, vintage, quantity):
+        quantity = float(quantity)
+        self._total += quantity
+        self._productivity += quantity * float(self.registry.lpc[vintage])
+        matches = np.flatnonzero(self.vintages == vintage)
+        if len(matches):
+            self.stock[matches[0]] += quantity
+            return None
+        self.vintages = np.append(self.vintages, vintage)
+        self.stock = np.append(self.stock, quantity)
+
+    def scrap(self, vintages, quantities=None):
+        """Remove ``quantities`` machines of each of ``vintages`` at once.
+
+        A vintage is dropped if its quantity is ``None`` or at least its
+        stock. The remaining rows are compacted in one pass and the running
+        sums re-synced from them.
+        """
+        rows = self.rows(vintages)
+        stock = self.stock[rows]
+        if quantities is None:
+            removed = stock
+        else:
+            removed = np.array([
+                s if q is None else min(float(q), s)
+                for s, q in zip(stock.tolist(), quantities)
+            ], dtype=np.float64)
+        whole = removed >= stock
+        self.stock[rows] -= removed
+        if whole.any():
+            keep = np.ones(len(self.vintages), dtype=bool)
+            keep[rows[whole]] = False
+            self.vintages = self.vintages[keep]
+            self.stock = self.stock[keep]
+            self.sync()
+            return None
+        self._total -= float(removed.sum())
+        self._productivity -= float(
+            np.dot(removed, self.registry.lpc[self.vintages[rows]])
+        )
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Run-ahead web visualization for long runs.
+
+``BackgroundServer`` steps the model in a worker thread, independently of
+the browser. Every frame the browser asks for, a ``StreamingChartModule``
+sends only the points collected since the previous frame. Once a chart would
+hold more than ``budget`` points, the whole series is downsampled with
+largest triangle three buckets (LTTB) and sent again, so neither the messages
+nor the charts grow with the number of steps.
+"""
+import json
+import os
+import threading
+
+from mesa.visualization.ModularVisualization import (
+    ModularServer, VisualizationElement
+)
+import numpy as np
+import tornado.web
+
+
+static_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+
+def lttb(x, y, n_out):
+    """Indices of ``n_out`` points that keep the shape of the line ``x, y``.
+
+    Largest triangle three buckets: the first and last point are kept and
+    from each bucket in between the point forming the largest triangle with
+    the point kept in the previous bucket and the mean of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def points(x, y):
+    # JSON has no NaN or infinity, the chart shows a gap for null
+    return [
+        [xi, yi if np.isfinite(yi) else None]
+        for xi, yi in zip(x.tolist(), y.tolist())
+    ]
+
+
+class BackgroundRunner:
+    """Steps a model in a worker thread, up to ``max_steps``.
+
+    Stands in for the model in ``ModularServer``: ``step`` starts the worker
+    instead of advancing the model, and ``running`` stays true until the
+    frame after the worker finished, so that the last steps are displayed.
+    """
+
+    def __init__(self, model, max_steps):
+        self.model = model
+        self.max_steps = max_steps
+        self.steps = 0
+        self.error = None
+        self._done = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def collected(self):
+        """Number of rows of the model reporters that are complete."""
+        # the model collects once before the first step
+        return self.steps + 1
+
+    @property
+    def running(self):
+        return not self._done
+
+    def _run(self):
+        try:
+            while (not self._stop.is_set() and self.model.running
+                   and self.steps < self.max_steps):
+                self.model.step()
+                self.steps += 1
+        except Exception as error:  # shown on the next frame
+            self.error = error
+
+    def step(self):
+        if not self._thread.is_alive():
+            if self._thread.ident is None:
+                self._thread.start()
+            else:
+                self._done = True
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.ident is not None:
+            self._thread.join()
+
+
+class StreamingChartModule(VisualizationElement):
+    """Line chart of model reporters that receives new points incrementally.
+
+    ``series`` is a list of ``{"Label": reporter, "Color": colour}`` as for
+    mesa's ``ChartModule``. At most ``budget`` points are kept per series;
+    when they would be exceeded, the series are downsampled to half the
+    budget and replaced.
+    """
+
+    package_includes = ['Chart.min.js']
+    local_includes = ['complex_economies/StreamingChartModule.js']
+
+    def __init__(self, series, budget=500, canvas_height=200,
+                 canvas_width=500, data_collector_name='datacollector'):
+        self.series = series
+        self.budget = budget
+        self.data_collector_name = data_collector_name
+        self.js_code = 'elements.push(new StreamingChartModule({}, {}, {}));'.format(
+            json.dumps(series), canvas_width, canvas_height
+        )
+        self.runner = None
+        self.sent = 0
+        self.shown = 0
+
+    def render(self, runner):
+        if runner is not self.runner:
+            self.runner = runner
+            self.sent = self.shown = 0
+        model_vars = getattr(runner.model, self.data_collector_name).model_vars
+        collected = runner.collected
+        new = collected - self.sent
+        if self.shown + new <= self.budget:
+            start, reset = self.sent, self.sent == 0
+            self.shown += new
+        else:
+            start, reset = 0, True
+            self.shown = self.budget // 2
+        steps = np.arange(start, collected)
+        data = []
+        for s in self.series:
+            values = np.asarray(
+                model_vars[s['Label']][start:collected], dtype=np.float64
+            )
+            if start == 0 and collected > self.budget:
+                keep = lttb(steps, values, self.budget // 2)
+                data.append(points(steps[keep], values[keep]))
+            else:
+                data.append(points(steps, values))
+        self.sent = collected
+        return {'reset': reset, 'step': collected - 1, 'series': data}
+
+
+class BackgroundServer(ModularServer):
+    """``ModularServer`` that runs the model ahead of the display.
+
+    Use with ``StreamingChartModule`` elements. ``max_steps`` defaults to the
+    model's ``sample_size`` parameter.
+    """
+
+    handlers = [
+        ModularServer.page_handler,
+        ModularServer.socket_handler,
+        ModularServer.static_handler,
+        (r'/local/complex_economies/(.*)', tornado.web.StaticFileHandler,
+         {'path': static_path}),
+        ModularServer.local_handler
+    ]
+
+    def __init__(self, model_cls, visualization_elements, name='Mesa Model',
+                 model_params={}, max_steps=None):
+        self.run_steps = max_steps
+        super().__init__(model_cls, visualization_elements, name, model_params)
+
+    def reset_model(self):
+        if isinstance(getattr(self, 'model', None), BackgroundRunner):
+            self.model.stop()
+        super().reset_model()
+        max_steps = self.run_steps or self.model.parameters['sample_size']
+        self.model = BackgroundRunner(self.model, max_steps)
@@ -1,5 +1,10 @@
+import sys
 
-from complex_economies.server import server
+from complex_economies.server import make_background_server, server
 
 
-server.launch()
+# run ahead of the display with: python run.py --background
+if '--background' in sys.argv[1:]:
+    make_background_server().launch()
+else:
+    server.launch()
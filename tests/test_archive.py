@@ -0,0 +1,56 @@
+"""Exited firms leave the schedule and are kept in the archive."""
+from copy import deepcopy
+from types import SimpleNamespace
+
+from complex_economies.archive import FirmArchive
+from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import (
+    benchmark_parameters, initial_conditions
+)
+
+steps = 3
+
+
+def firm(unique_id, group, liquid_assets):
+    return SimpleNamespace(
+        unique_id=unique_id, group=group,
+        table_row=lambda: {
+            'step': 1, 'agent_id': unique_id, 'liquid_assets': liquid_assets
+        }
+    )
+
+
+def test_add_get_and_load():
+    archive = FirmArchive(['consumption_firm', 'capital_firm'])
+    archive.add(firm(7, 'capital_firm', -1.), 2)
+    archive.add(firm(9, 'capital_firm', -3.), 4)
+    assert len(archive) == 2 and 9 in archive and 8 not in archive
+    assert archive.get(9) == {
+        'agent_id': 9, 'liquid_assets': -3., 'exit_step': 4
+    }
+    assert archive.get_table_dataframe('capital_firm')['agent_id'].tolist() \
+        == [7, 9]
+    assert archive.get_table_dataframe('consumption_firm').empty
+
+    archive.load('capital_firm', {'agent_id': [11], 'exit_step': [5]})
+    assert 7 not in archive
+    assert archive.get(11) == {'agent_id': 11, 'exit_step': 5}
+
+
+def test_every_firm_is_scheduled_or_archived():
+    model = ComplexEconomy(
+        deepcopy(benchmark_parameters), seed=1, **initial_conditions
+    )
+    for _ in range(steps):
+        model.step()
+    scheduled = set(model.schedule._agents)
+    assert len(model.archive) > 0
+    assert not any(unique_id in model.archive for unique_id in scheduled)
+    assert len(scheduled) + len(model.archive) == model.current_id + 1
+    for group in model.groups:
+        archived = model.archive.get_table_dataframe(group)
+        if archived.empty:
+            continue
+        assert archived['exit_step'].between(1, steps).all()
+        for unique_id in archived['agent_id'].tolist():
+            assert model.archive.get(unique_id)['agent_id'] == unique_id
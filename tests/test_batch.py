@@ -0,0 +1,58 @@
+"""Batch runs give the runs of their seeds and overrides, in any process."""
+import pandas as pd
+import pytest
+
+from complex_economies.batch import apply_overrides, expand_grid, run_batch
+from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import benchmark_parameters
+
+steps = 2
+
+
+def test_grid_and_overrides():
+    grid = expand_grid({'mark_up': [.2, .3], 'wage_setting.cpi_weight': [1]})
+    assert grid == [
+        {'mark_up': .2, 'wage_setting.cpi_weight': 1},
+        {'mark_up': .3, 'wage_setting.cpi_weight': 1}
+    ]
+    parameters, conditions = apply_overrides({**grid[0], 'cpi': 1.5})
+    assert parameters['mark_up'] == .2
+    assert parameters['wage_setting']['cpi_weight'] == 1
+    assert conditions['cpi'] == 1.5
+    # the defaults are left alone
+    assert benchmark_parameters['mark_up'] == .3
+    with pytest.raises(KeyError, match='unknown parameter'):
+        apply_overrides({'mark_ups': .2})
+
+
+def test_runs_match_single_runs():
+    overrides = [{}, {'mark_up': .2}]
+    batch = run_batch(overrides, seeds=2, base_seed=5, steps=steps,
+                      processes=2)
+    assert batch['runs'][['run_id', 'overrides_id', 'seed']].values.tolist() \
+        == [[0, 0, 5], [1, 0, 6], [2, 1, 5], [3, 1, 6]]
+
+    parameters, conditions = apply_overrides(overrides[1])
+    model = ComplexEconomy(parameters, seed=6, **conditions)
+    for _ in range(steps):
+        model.step()
+    model_data = batch['model'][batch['model']['run_id'] == 3]
+    pd.testing.assert_frame_equal(
+        model_data.drop(columns=['run_id', 'step']).reset_index(drop=True),
+        model.datacollector.get_model_vars_dataframe()
+    )
+    agent_data = batch['capital_firm'][batch['capital_firm']['run_id'] == 3]
+    pd.testing.assert_frame_equal(
+        agent_data.drop(columns='run_id').reset_index(drop=True),
+        model.recorder.get_table_dataframe('capital_firm')
+    )
+
+
+def test_seeds_give_the_same_runs_in_one_process():
+    parallel = run_batch(seeds=2, steps=steps, processes=2, agent_data=False)
+    serial = run_batch(seeds=2, steps=steps, processes=1, agent_data=False)
+    assert set(serial) == {'runs', 'model'}
+    pd.testing.assert_frame_equal(parallel['model'], serial['model'])
+    # and the two seeds give different runs
+    gdp = parallel['model'].groupby('run_id')['gdp'].apply(list)
+    assert gdp[0] != gdp[1]
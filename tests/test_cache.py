@@ -0,0 +1,52 @@
+"""Cached quantities are dropped whenever their inputs change."""
+from copy import deepcopy
+
+import numpy as np
+
+from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import (
+    benchmark_parameters, initial_conditions
+)
+from complex_economies.utils.cache import StageCache
+
+
+class CheckedCache(StageCache):
+    """Recomputes every hit and compares it with the cached value."""
+
+    def get(self, name, compute):
+        value = super().get(name, compute)
+        np.testing.assert_equal(value, compute(), err_msg=name)
+        return value
+
+
+def test_get_invalidate_and_stats():
+    cache = StageCache({'a': ['x', ('firm', 'stage_one')], 'b': ['y']})
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value
+
+    assert cache.get('a', lambda: compute(1)) == 1
+    assert cache.get('a', lambda: compute(2)) == 1
+    assert cache.get('b', lambda: compute(3)) == 3
+    cache.invalidate(('firm', 'stage_one'))
+    cache.invalidate('unrelated')
+    assert cache.get('a', lambda: compute(4)) == 4
+    assert cache.get('b', lambda: compute(5)) == 3
+    assert calls == [1, 3, 4]
+    assert cache.stats()['b'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    cache.clear()
+    assert cache.get('b', lambda: compute(6)) == 6
+
+
+def test_declared_events_cover_every_change():
+    model = ComplexEconomy(
+        deepcopy(benchmark_parameters), seed=2, **initial_conditions
+    )
+    cache = CheckedCache(model.cache.dependencies)
+    model.cache = model.schedule.cache = cache
+    for _ in range(3):
+        model.step()
+    # the values read from the cache were checked
+    assert sum(stats['hits'] for stats in cache.stats().values()) > 0
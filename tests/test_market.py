@@ -0,0 +1,65 @@
+"""Machine orders are rationed pro rata when a supplier produced too little."""
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from complex_economies.market import OfferTable, OrderBook
+
+
+def make_offers(prices):
+    return OfferTable([
+        SimpleNamespace(
+            unique_id=unique_id, unit_production_cost=1,
+            machine=SimpleNamespace(price=price, lpc_price_ratio=1)
+        )
+        for unique_id, price in enumerate(prices)
+    ])
+
+
+def make_book(dtype, number):
+    offers = make_offers([2, 3])
+    buyers = [SimpleNamespace(supplier=s) for s in (0, 1, 0, 0)]
+    quantities = [number(q) for q in (4, 5, 0, 12)]
+    return OrderBook(offers, buyers, quantities, dtype), buyers
+
+
+@pytest.mark.parametrize('dtype, number', [
+    (np.float64, float), (object, Decimal)
+])
+def test_orders_are_collected_per_supplier(dtype, number):
+    book, buyers = make_book(dtype, number)
+    # the buyer without an order is not in the book
+    assert book.buyers == [buyers[0], buyers[1], buyers[3]]
+    assert book.suppliers.tolist() == [0, 1, 0]
+    assert book.demand.tolist() == [number(16), number(5)]
+    assert book.total == number(21)
+
+
+@pytest.mark.parametrize('dtype, number', [
+    (np.float64, float), (object, Decimal)
+])
+def test_rationed_buyers_get_their_share_rounded_down(dtype, number):
+    book, buyers = make_book(dtype, number)
+    # supplier 0 made 10 of the 16 machines ordered, supplier 1 all 5
+    output = np.array([number(10), number(5)], dtype=dtype)
+    prices = np.array([number(2), number(3)], dtype=dtype)
+    expansion = np.array([number(3), number(1), number(5)], dtype=dtype)
+    rationed, new_expansion, replacement, reimbursement = book.settle(
+        output, prices, expansion
+    )
+    assert rationed == [buyers[0], buyers[3]]
+    # shares of 2.5 and 7.5 machines, cut from replacement first
+    assert new_expansion.tolist() == [2, 5]
+    assert replacement.tolist() == [0, 2]
+    assert reimbursement.tolist() == [number(4), number(14)]
+
+
+def test_nothing_is_rationed_when_output_covers_demand():
+    book, _ = make_book(np.float64, float)
+    rationed, *amounts = book.settle(
+        np.array([16., 5.]), np.array([2., 3.]), np.array([3., 1., 5.])
+    )
+    assert rationed == []
+    assert all(len(a) == 0 for a in amounts)
@@ -0,0 +1,74 @@
+"""One seed gives one run, whatever the batching or checkpoints."""
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from complex_economies.checkpoint import load_checkpoint, save_checkpoint
+from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import (
+    benchmark_parameters, initial_conditions
+)
+from complex_economies.streams import RandomStreams, purposes
+
+# the 200/50 benchmark economy
+seed = 7
+steps = 5
+tables = ['consumption_firm', 'capital_firm']
+
+
+def make_model():
+    return ComplexEconomy(
+        deepcopy(benchmark_parameters), seed=seed, **initial_conditions
+    )
+
+
+def run(model, n_steps):
+    for _ in range(n_steps):
+        model.step()
+    return model
+
+
+def assert_same_run(expected, actual):
+    pd.testing.assert_frame_equal(
+        expected.datacollector.get_model_vars_dataframe(),
+        actual.datacollector.get_model_vars_dataframe()
+    )
+    for table in tables:
+        pd.testing.assert_frame_equal(
+            expected.recorder.get_table_dataframe(table),
+            actual.recorder.get_table_dataframe(table)
+        )
+
+
+@pytest.fixture(scope='module')
+def uninterrupted_run():
+    return run(make_model(), steps)
+
+
+def test_checkpoint_resumes_the_run(uninterrupted_run, tmp_path):
+    path = tmp_path / 'checkpoint.npz'
+    model = run(make_model(), 2)
+    save_checkpoint(model, path)
+    assert_same_run(uninterrupted_run, run(load_checkpoint(path), steps - 2))
+
+
+@pytest.mark.parametrize('purpose', purposes)
+def test_scalar_draws_match_array_draws(purpose):
+    streams = RandomStreams(seed)
+    ids = [0, 1, 249, 10 ** 6]
+    for step in (0, 1, 600):
+        for int_id in ids:
+            assert (
+                streams.uniform(purpose, step, int_id)
+                == streams.uniform(purpose, step, np.array([int_id]))[0]
+            )
+            assert (
+                streams.integers(purpose, step, int_id, 50)
+                == streams.integers(purpose, step, np.array([int_id]), 50)[0]
+            )
+        np.testing.assert_array_equal(
+            streams.uniform(purpose, step, np.array(ids), np.arange(4)),
+            [streams.uniform(purpose, step, i, d) for d, i in enumerate(ids)]
+        )
@@ -0,0 +1,71 @@
+"""The streaming sink writes every collected row once, in order."""
+from copy import deepcopy
+
+import pandas as pd
+
+from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import (
+    benchmark_parameters, initial_conditions
+)
+from complex_economies.sink import StreamingSink
+
+seed = 3
+steps = 5
+tables = ['model', 'consumption_firm', 'capital_firm']
+
+
+def make_model():
+    return ComplexEconomy(
+        deepcopy(benchmark_parameters), seed=seed, **initial_conditions
+    )
+
+
+def run_with_sink(path, keep, model=None):
+    model = model or make_model()
+    with StreamingSink(path, format='csv', row_group_steps=2,
+                       keep=keep) as sink:
+        model.sink = sink
+        while model.schedule.steps < steps:
+            model.step()
+    return model
+
+
+def read(path, table):
+    return pd.read_csv(path / f'{table}.csv', float_precision='round_trip')
+
+
+def test_kept_rows_are_written(tmp_path):
+    model = run_with_sink(tmp_path, keep=True)
+    model_vars = model.datacollector.get_model_vars_dataframe()
+    written = read(tmp_path, 'model')
+    assert written['step'].tolist() == list(range(steps + 1))
+    pd.testing.assert_frame_equal(
+        written.drop(columns='step'), model_vars.reset_index(drop=True),
+        check_dtype=False
+    )
+    for table in tables[1:]:
+        pd.testing.assert_frame_equal(
+            read(tmp_path, table), model.recorder.get_table_dataframe(table),
+            check_dtype=False
+        )
+
+
+def test_dropped_rows_are_written(tmp_path):
+    run_with_sink(tmp_path / 'kept', keep=True)
+    model = run_with_sink(tmp_path / 'dropped', keep=False)
+    for table in tables:
+        pd.testing.assert_frame_equal(
+            read(tmp_path / 'dropped', table), read(tmp_path / 'kept', table)
+        )
+    for table in tables[1:]:
+        assert len(model.recorder.get_table_dataframe(table)) == 0
+
+
+def test_dropping_rows_keeps_returned_frames(tmp_path):
+    model = make_model()
+    model.step()
+    # the frame wraps the recorder's buffers without copying
+    frame = model.recorder.get_table_dataframe('consumption_firm')
+    expected = frame.copy()
+    run_with_sink(tmp_path, keep=False, model=model)
+    pd.testing.assert_frame_equal(frame, expected)
@@ -0,0 +1,100 @@
+"""Runs written to a result store read back unchanged."""
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from complex_economies.batch import run_batch
+from complex_economies.store import ResultStore, StoreWriter
+
+
+def make_run(run_id, n_steps=3, n_firms=2):
+    # steps of a run arrive sorted except for the step -1 rows of entrants
+    step = np.repeat(np.arange(n_steps), n_firms)
+    return pd.DataFrame({
+        'step': np.append(step, -1),
+        'agent_id': np.append(np.tile(np.arange(n_firms), n_steps), 9),
+        'profit': np.arange(n_steps * n_firms + 1) + run_id / 10,
+        'exited': np.arange(n_steps * n_firms + 1) % 2 == 0
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    writer = StoreWriter(tmp_path / 'store')
+    for run_id in (3, 1):
+        writer.add(run_id, 'consumption_firm', make_run(run_id))
+    return ResultStore(tmp_path / 'store')
+
+
+def sorted_run(run_id):
+    run = make_run(run_id)
+    return run.iloc[np.argsort(run['step'], kind='stable')].reset_index(
+        drop=True
+    )
+
+
+def test_runs_read_back_sorted_by_step(store):
+    assert store.runs('consumption_firm') == [3, 1]
+    assert store.columns('consumption_firm') == [
+        'run_id', 'step', 'agent_id', 'profit', 'exited'
+    ]
+    for run_id in (3, 1):
+        frame = store.frame('consumption_firm', run_id)
+        assert (frame['run_id'] == run_id).all()
+        # copied, the mapped columns are np.memmap instead of np.ndarray
+        pd.testing.assert_frame_equal(
+            frame.drop(columns='run_id').copy(), sorted_run(run_id)
+        )
+
+
+def test_columns_and_selections(store):
+    profit = store.column('consumption_firm', 'profit')
+    assert isinstance(profit, np.memmap)
+    np.testing.assert_array_equal(
+        profit,
+        np.concatenate([sorted_run(3)['profit'], sorted_run(1)['profit']])
+    )
+    np.testing.assert_array_equal(
+        store.column('consumption_firm', 'profit', runs=[1, 3]),
+        np.concatenate([sorted_run(1)['profit'], sorted_run(3)['profit']])
+    )
+    run = sorted_run(1)
+    np.testing.assert_array_equal(
+        store.select('consumption_firm', 'profit', 1, step=2, agent_id=1),
+        run.loc[(run['step'] == 2) & (run['agent_id'] == 1), 'profit']
+    )
+    assert store.frame('consumption_firm', 3, ['agent_id'], step=-1)[
+        'agent_id'
+    ].tolist() == [9]
+
+
+def test_writer_rejects_what_it_cannot_store(tmp_path):
+    writer = StoreWriter(tmp_path)
+    with pytest.raises(TypeError):
+        writer.add(0, 'model', {'step': np.arange(2),
+                                'gdp': np.array([Decimal(1), Decimal(2)])})
+    writer.add(0, 'model', {'step': np.arange(2), 'gdp': np.ones(2)})
+    with pytest.raises(ValueError):
+        writer.add(0, 'model', {'step': np.arange(2), 'gdp': np.ones(2)})
+    with pytest.raises(ValueError):
+        writer.add(1, 'model', {'step': np.arange(2)})
+    with pytest.raises(FileExistsError):
+        StoreWriter(tmp_path)
+
+
+def test_batch_runs_read_back_from_the_store(tmp_path):
+    kwargs = dict(seeds=2, steps=2, processes=2)
+    expected = run_batch(**kwargs)
+    run_batch(store=tmp_path, **kwargs)
+    store = ResultStore(tmp_path)
+    for table in ('model', 'consumption_firm', 'capital_firm'):
+        assert sorted(store.runs(table)) == [0, 1]
+        for run_id in (0, 1):
+            frame = expected[table]
+            pd.testing.assert_frame_equal(
+                store.frame(table, run_id).copy(),
+                frame[frame['run_id'] == run_id].reset_index(drop=True),
+                check_dtype=False
+            )
@@ -0,0 +1,42 @@
+"""Traced lines are plain JSON, one per agent and stage pass."""
+from copy import deepcopy
+from decimal import Decimal
+import io
+import json
+
+from complex_economies.model import ComplexEconomy
+from complex_economies.parameters import (
+    benchmark_parameters, initial_conditions
+)
+from complex_economies.tracing import Tracer
+
+
+def trace(numeric, **selection):
+    output = io.StringIO()
+    tracer = Tracer(output, stages=['stage_four'], **selection)
+    model = ComplexEconomy(
+        deepcopy(benchmark_parameters), seed=1, tracer=tracer,
+        numeric=numeric, **initial_conditions
+    )
+    model.step()
+    tracer.close()
+    return model, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_default_fields_are_the_table_columns():
+    model, lines = trace('float', groups=['consumption_firm'])
+    assert len(lines) == model.parameters['n_consumption_firms']
+    agent = model.schedule._agents[lines[0]['id']]
+    columns = [
+        attribute for attribute, _ in agent.table_columns.values()
+        if attribute != 'unique_id'
+    ]
+    assert list(lines[0]) == ['step', 'stage', 'group', 'id', *columns]
+
+
+def test_decimal_values_are_exact_strings():
+    model, lines = trace('decimal', fields=['liquid_assets', 'missing'])
+    for line in lines:
+        agent = model.schedule._agents[line['id']]
+        assert Decimal(line['liquid_assets']) == agent.liquid_assets
+        assert line['missing'] is None
@@ -0,0 +1,66 @@
+"""Running machine totals follow the stock through adds and scraps."""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from complex_economies.vintages import MachineStock, VintageRegistry
+
+
+def machine(producer, generation, lpc):
+    return SimpleNamespace(
+        producer=producer, generation=generation,
+        labour_productivity_coefficient=lpc
+    )
+
+
+@pytest.fixture
+def stock():
+    registry = VintageRegistry(capacity=2, debug=True)
+    vintages = [
+        registry.intern(machine(producer, 1, lpc))
+        for producer, lpc in enumerate([1., 2., 4.])
+    ]
+    return MachineStock(registry, vintages, [10, 20, 30])
+
+
+def assert_totals(stock, vintages, quantities):
+    assert stock.vintages.tolist() == vintages
+    assert stock.stock.tolist() == quantities
+    # debug registry: reading the totals also checks them against the arrays
+    assert stock.total() == sum(quantities)
+    assert stock.productivity() == pytest.approx(
+        np.dot(quantities, stock.registry.lpc[vintages])
+    )
+
+
+def test_registry_interns_each_vintage_once(stock):
+    registry = stock.registry
+    assert registry.intern(machine(1, 1, 99.)) == 1
+    assert registry.intern(machine(1, 2, 3.)) == 3
+    assert len(registry) == 4
+    assert registry.lpc.tolist() == [1., 2., 4., 3.]
+    assert registry.key(3) == (1, 2)
+
+
+def test_add_to_held_and_new_vintages(stock):
+    stock.add(1, 5)
+    assert_totals(stock, [0, 1, 2], [10., 25., 30.])
+    new = stock.registry.intern(machine(0, 2, 8.))
+    stock.add(new, 3)
+    assert_totals(stock, [0, 1, 2, new], [10., 25., 30., 3.])
+
+
+def test_scrap_part_and_whole_vintages(stock):
+    stock.scrap([2, 0], [5, None])
+    assert_totals(stock, [1, 2], [20., 25.])
+    stock.scrap([1], [50])
+    assert_totals(stock, [2], [25.])
+    stock.scrap([2])
+    assert_totals(stock, [], [])
+
+
+def test_check_catches_drifted_totals(stock):
+    stock._total += 1
+    with pytest.raises(AssertionError, match='capital stock'):
+        stock.total()